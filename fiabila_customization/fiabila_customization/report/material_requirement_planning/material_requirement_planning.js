@@ -13,6 +13,15 @@ frappe.query_reports["Material Requirement Planning"] =
 			reqd: 1,
 			default: frappe.defaults.get_user_default("Company"),
 		},
+		{
+			fieldname: "consolidated_companies",
+			label: __("Consolidate Companies"),
+			fieldtype: "MultiSelectList",
+			description: __("Plan these companies in one run instead of Company, netted per company"),
+			get_data: function (txt) {
+				return frappe.db.get_link_options("Company", txt);
+			},
+		},
 		{
 			fieldname: "based_on",
 			label: __("Based On"),
@@ -72,14 +81,144 @@ frappe.query_reports["Material Requirement Planning"] =
 			options: ["Delivery Date", "Total Amount"],
 			default: "Delivery Date",
 		},
+
+		{
+			fieldname: "as_of_date",
+			label: __("Stock As Of"),
+			fieldtype: "Date",
+			description: __("Net against the stock at the end of this date instead of the current stock"),
+		},
+
+		{
+			fieldname: "time_phased",
+			label: __("Time-Phased"),
+			fieldtype: "Check",
+		},
+
+		{
+			fieldname: "period",
+			label: __("Period"),
+			fieldtype: "Select",
+			options: ["Day", "Week", "Month"],
+			default: "Week",
+			depends_on: "eval:doc.time_phased",
+		},
+
+		{
+			fieldname: "periods",
+			label: __("No. of Periods"),
+			fieldtype: "Int",
+			default: 12,
+			depends_on: "eval:doc.time_phased",
+		},
+
+		{
+			fieldname: "sparse_stock_columns",
+			label: __("Only Warehouses With Stock"),
+			fieldtype: "Check",
+			depends_on: "eval:!doc.time_phased",
+		},
+
+		{
+			fieldname: "compact_stock",
+			label: __("Compact Stock Cells"),
+			fieldtype: "Check",
+			depends_on: "eval:!doc.time_phased",
+		},
 		
 	],
 
+	formatter: function (value, row, column, data, default_formatter) {
+		// compact_stock leaves zero stock cells out of the rows
+		if (column.fieldname && column.fieldname.startsWith("stock_") && value == null && data) {
+			value = 0;
+		}
+		return default_formatter(value, row, column, data);
+	},
+
+	after_datatable_render: function () {
+		// a full render shows the latest cached result of these filters
+		frappe.query_report.mrp_version = null;
+	},
+
 	onload: function (report) {
 
-		// Get the selected item group filter value (if any)
-		const item_group_filter = report.get_filter_value("item_group");
-		console.log("Selected Item Group Filter →", item_group_filter);
+		// Progress of the background Material Request job
+		frappe.realtime.off("mrp_material_request_progress");
+		frappe.realtime.on("mrp_material_request_progress", (status) => {
+			show_material_request_status(status);
+		});
+
+		report.page.add_menu_item(__("Export Full Result"), function () {
+			frappe.prompt(
+				{
+					fieldname: "file_format",
+					label: __("Format"),
+					fieldtype: "Select",
+					options: ["CSV", "Parquet"],
+					default: "CSV",
+					reqd: 1,
+				},
+				(values) => {
+					frappe.call({
+						method: "fiabila_customization.mrp.export.export_report",
+						args: {
+							filters: report.get_filter_values(),
+							file_format: values.file_format,
+						},
+						callback: function (r) {
+							if (r.message) {
+								wait_for_export(r.message.export_id);
+							}
+						},
+					});
+				},
+				__("Export Material Requirement Planning"),
+				__("Export")
+			);
+		});
+
+		report.page.add_menu_item(__("Demand Sources"), function () {
+			frappe.prompt(
+				{
+					fieldname: "item_code",
+					label: __("Raw Material"),
+					fieldtype: "Link",
+					options: "Item",
+					reqd: 1,
+				},
+				(values) => {
+					frappe.call({
+						method: "fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning.get_demand_sources",
+						args: {
+							item_code: values.item_code,
+							filters: report.get_filter_values(),
+						},
+						callback: function (r) {
+							show_demand_sources(values.item_code, r.message || []);
+						},
+					});
+				},
+				__("Orders Driving the Demand"),
+				__("Show")
+			);
+		});
+
+		// Re-read only what changed since these rows were computed and patch them
+		report.page.add_button(__("Refresh Changes"), function () {
+			frappe.call({
+				method: "fiabila_customization.mrp.delta.get_report_delta",
+				args: {
+					filters: report.get_filter_values(),
+					version: report.mrp_version,
+				},
+				callback: function (r) {
+					if (r.message) {
+						apply_report_delta(report, r.message);
+					}
+				},
+			});
+		});
 
 		// Add a custom button to create Material Request
 		report.page.add_button(__('Create Material Request'), function() {
@@ -90,62 +229,27 @@ frappe.query_reports["Material Requirement Planning"] =
 				return;
 			}
 
-			// Step 2: Aggregate total qty by item_code
-			const itemTotals = {};
-			report.data.forEach(row => {
-				if (!row.item_code) return;
-
-				const item_code = row.item_code;
-				const qty = flt(row.balance_qty) || 0;
-
-				// Only include positive or required qtys
-				if (qty > 0) {
-					itemTotals[item_code] = (itemTotals[item_code] || 0) + qty;
-				}
-			});
-
-			const items = Object.entries(itemTotals).map(([item_code, qty]) => ({
-				item_code: item_code,
-				qty: Math.abs(qty)
-			}));
-
-			if (items.length === 0) {
-				frappe.msgprint(__('No valid items with positive quantity to create Material Request.'));
-				return;
-			}
+			// Step 2: The server builds the per-item proposal from its cached copy of this run,
+			// so only the filters identifying the run are sent back (item group included)
 
 			// Step 3: Confirm before creating Material Request
+			// The server keys the job by the run shown here: retries and repeated clicks
+			// on the same run don't create the requests twice
+
 			frappe.confirm(
-				`Do you want to create a Material Request for <b>${items.length}</b> item(s)?`,
+				__("Do you want to create Material Requests for the positive balances in this report?"),
 				() => {
-					// User confirmed — call backend
+					// User confirmed — queue the job on the backend
 					frappe.call({
-						method: "fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning.create_material_request_draft",
+						method: "fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning.create_material_request_from_run",
 						args: {
-							items: items,
-							item_group_filter: item_group_filter
+							filters: report.get_filter_values(),
 						},
 						freeze: true,
-						freeze_message: __("Creating Material Request..."),
+						freeze_message: __("Queueing Material Request creation..."),
 						callback: function (r) {
 							if (r.message) {
-								if (r.message.created_requests) {
-									// If multiple MRs created
-									const list = r.message.created_requests.map(mr => `<li>${mr}</li>`).join("");
-									frappe.msgprint({
-										title: __("Material Requests Created"),
-										message: `<ul>${list}</ul>`,
-										indicator: "green"
-									});
-								} else {
-									frappe.msgprint(r.message);
-								}
-							} else {
-								frappe.msgprint({
-									title: __("No Material Request Created"),
-									message: __("All item groups already have an existing Material Request."),
-									indicator: "orange"
-								});
+								show_material_request_status(r.message);
 							}
 						}
 					});
@@ -160,3 +264,118 @@ frappe.query_reports["Material Requirement Planning"] =
 
 
 }
+
+// The export runs in a background job, which publishes the file when it is written
+function wait_for_export(export_id) {
+	frappe.show_alert({ message: __("Exporting, the file will open when it is ready"), indicator: "blue" });
+
+	const on_ready = (status) => {
+		if (status.export_id !== export_id) {
+			return;
+		}
+
+		frappe.realtime.off("mrp_export_ready", on_ready);
+		if (status.file_url) {
+			window.open(status.file_url);
+		} else {
+			frappe.msgprint({ title: __("Export Failed"), message: status.error, indicator: "red" });
+		}
+	};
+
+	frappe.realtime.on("mrp_export_ready", on_ready);
+}
+
+function show_material_request_status(status) {
+	if (status.status === "queued" || status.status === "running") {
+		frappe.show_progress(
+			__("Creating Material Requests"),
+			status.progress || 0,
+			100,
+			__("{0} Material Request(s) created", [(status.created_requests || []).length])
+		);
+		return;
+	}
+
+	frappe.hide_progress();
+
+	if (status.status === "failed") {
+		frappe.msgprint({
+			title: __("Material Request Creation Failed"),
+			message: status.message,
+			indicator: "red"
+		});
+	} else if (status.created_requests && status.created_requests.length) {
+		// If multiple MRs created
+		const list = status.created_requests.map(mr => `<li>${mr}</li>`).join("");
+		frappe.msgprint({
+			title: __("Material Requests Created"),
+			message: `<ul>${list}</ul>`,
+			indicator: "green"
+		});
+	} else {
+		frappe.msgprint({
+			title: __("No Material Request Created"),
+			message: status.message || __("All item groups already have an existing Material Request."),
+			indicator: "orange"
+		});
+	}
+}
+
+function show_demand_sources(item_code, sources) {
+	if (!sources.length) {
+		frappe.msgprint(__("No open order needs {0} in this report.", [item_code]));
+		return;
+	}
+
+	const rows = sources
+		.map(
+			(d) => `<tr>
+				<td>${frappe.utils.escape_html(d.order)}</td>
+				<td>${frappe.utils.escape_html(d.production_item || "")}</td>
+				<td class="text-right">${format_number(d.required_qty)}</td>
+			</tr>`
+		)
+		.join("");
+
+	frappe.msgprint({
+		title: __("Orders Driving the Demand for {0}", [item_code]),
+		message: `<table class="table table-bordered">
+			<thead><tr><th>${__("Order")}</th><th>${__("Item")}</th><th class="text-right">${__("Required Qty")}</th></tr></thead>
+			<tbody>${rows}</tbody>
+		</table>`,
+		wide: true,
+	});
+}
+
+function apply_report_delta(report, delta) {
+	if (delta.full || !report.datatable) {
+		report.refresh();
+		return;
+	}
+
+	// delta.rows holds, per row, the index of the unchanged previous row or the new row itself
+	const previous = report.data || [];
+	const data = delta.rows.map((row) => (typeof row === "number" ? previous[row] : row));
+	report.data = data;
+	report.mrp_version = delta.version;
+
+	if (delta.in_place) {
+		// same rows in the same places: redraw the cells of the changed ones only
+		const columns = report.datatable.getColumns().filter((column) => column.id && column.id[0] !== "_");
+		delta.rows.forEach((row, rowIndex) => {
+			if (typeof row === "number") {
+				return;
+			}
+			columns.forEach((column) => {
+				report.datatable.cellmanager.updateCell(column.colIndex, rowIndex, row[column.id], true);
+			});
+		});
+	} else {
+		report.datatable.refresh(data);
+	}
+
+	frappe.show_alert({
+		message: __("{0} row(s) changed, {1} added, {2} removed", [delta.changed, delta.added, delta.removed]),
+		indicator: "green",
+	});
+}
@@ -2,25 +2,123 @@
 # For license information, please see license.txt
 
 
-import frappe
-from frappe import _
-from pypika import Order
+import copy
 import datetime
+import hashlib
 import json
-from frappe.utils import nowdate
+import pickle
+from bisect import bisect_left, bisect_right
 
+import frappe
 from erpnext.stock.doctype.warehouse.warehouse import get_child_warehouses
+from frappe import _
+from frappe.utils import flt, now_datetime, nowdate
+from pypika import Order
+
+from fiabila_customization.mrp.bom_explosion import get_bom_snapshot
+from fiabila_customization.mrp.bom_requirements import get_bom_requirements
+from fiabila_customization.mrp.replica import run_on_replica
+from fiabila_customization.mrp.run_cache import (
+	get_filters_key,
+	get_run_filters_key,
+	get_run_pegging,
+	get_run_result,
+	get_run_token,
+	is_delta_used,
+	new_run_token,
+	normalize_filters,
+	set_run_pegging,
+	set_run_result,
+	set_run_version,
+	set_user_run,
+)
+from fiabila_customization.mrp.sharding import explode_sharded, pivot_warehouse_stock
+from fiabila_customization.mrp.shared_snapshot import get_shared_snapshot
+from fiabila_customization.mrp.single_flight import get_backend as get_single_flight_backend
+from fiabila_customization.mrp.single_flight import run_single_flight
+from fiabila_customization.mrp.stock_checkpoints import get_stock_as_of
+from fiabila_customization.mrp.time_phased import build_time_phased_plan
 
 
 def execute(filters=None):
-	return ProductionPlanReport(filters).execute_report()
+	filters_key = get_filters_key(filters)
+
+	computed = {}
+
+	def compute():
+		run_token, computed["columns"], computed["data"] = compute_run(filters, new_run_token(filters_key))
+		return run_token
+
+	# identical runs started while this one is computing wait for its run token
+	# and read the rows from the cached result
+	run_token = run_single_flight(filters_key, compute, get_single_flight_backend())
+	result = computed or get_run_result(run_token)
+	if not result:
+		run_token = compute()
+		result = computed
+
+	set_user_run(run_token)
+
+	return result["columns"], result["data"]
+
+
+def compute_run(filters, run_token):
+	started = now_datetime()
+
+	def run_report():
+		if (filters or {}).get("consolidated_companies"):
+			from fiabila_customization.mrp.consolidated import ConsolidatedPlanReport
+
+			report = ConsolidatedPlanReport(filters)
+			report.execute_report()
+			return report
+
+		report = ProductionPlanReport(filters)
+		report.load_inputs()
+		# netting changes the inputs, keep them as loaded when these filters are refreshed by delta
+		if not report.filters.time_phased and is_delta_used(get_run_filters_key(run_token)):
+			report.input_snapshot = pickle.dumps(report.get_inputs())
+		report.build_data()
+		return report
+
+	# map the shared snapshot and queue any rebuild it needs on the primary first:
+	# nothing registered on the replica connection is ever committed
+	snapshot = get_shared_snapshot()
+	if snapshot:
+		snapshot.has_current_warehouse_tree()
+
+	# the read-only stages go to the replica when one is configured and up to date
+	report = run_on_replica(run_report)
+	save_run(run_token, report, started)
+
+	return run_token, report.columns, report.data
+
+
+def save_run(run_token, report, started):
+	"""
+	Keep the result so follow-up actions can work from the run token instead of the rows.
+	Returns the version token of the result.
+	"""
+	version = set_run_version(run_token, started, report.input_snapshot)
+	set_run_result(run_token, report.columns, report.data, version=version)
+	set_run_pegging(run_token, report.pegging)
+
+	return version
+
+
+MATERIAL_REQUEST_BATCH_SIZE = 20
+MATERIAL_REQUEST_JOB_TTL = 6 * 60 * 60
+MATERIAL_REQUEST_PROGRESS_EVENT = "mrp_material_request_progress"
 
 
 @frappe.whitelist()
-def create_material_request_draft(items, item_group_filter=None):
+def create_material_request_draft(items, item_group_filter=None, idempotency_key=None):
     """
-    Create Material Requests grouped by Item Group.
-    Skip items already present (same item_code & qty) in existing open Material Requests.
+    Queue creation of Material Requests grouped by company and Item Group.
+    Skip items already present (same company, item_code & qty) in existing open Material Requests.
+
+    Calls with the same idempotency_key (retries, double clicks) don't queue the work
+    again; they get the status of the job already running, or resume it if it failed.
     """
 
     if isinstance(items, str):
@@ -29,114 +127,369 @@ def create_material_request_draft(items, item_group_filter=None):
     if not items:
         frappe.throw(_("No items provided for Material Request"))
 
-    # Fetch all existing (non-cancelled) Material Request Items
+    idempotency_key = idempotency_key or frappe.generate_hash(length=20)
+    status = get_material_request_job_status(idempotency_key)
+
+    if status and status["status"] != "failed":
+        return status
+
+    # only one caller per (key, attempt) gets to queue the job
+    previous = status or {}
+    attempt = previous.get("attempt", 0) + 1
+    claimed = frappe.cache().set(
+        frappe.cache().make_key(f"mrp_material_request_claim:{idempotency_key}:{attempt}"),
+        frappe.session.user,
+        nx=True,
+        ex=MATERIAL_REQUEST_JOB_TTL,
+    )
+    if not claimed:
+        return get_material_request_job_status(idempotency_key) or {
+            "idempotency_key": idempotency_key,
+            "status": "queued",
+        }
+
+    status = _set_material_request_job_status(
+        idempotency_key,
+        status="queued",
+        attempt=attempt,
+        created_requests=previous.get("created_requests", []),
+        done_groups=previous.get("done_groups", []),
+    )
+
+    frappe.enqueue(
+        "fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning.make_material_requests",
+        queue="long",
+        timeout=MATERIAL_REQUEST_JOB_TTL,
+        items=items,
+        item_group_filter=item_group_filter,
+        idempotency_key=idempotency_key,
+        user=frappe.session.user,
+    )
+
+    return status
+
+
+@frappe.whitelist()
+def create_material_request_from_run(run_token=None, filters=None, item_group_filter=None, idempotency_key=None):
+    """
+    Queue Material Requests for the positive balances of a cached report run.
+    The client only sends the run token (or the filters of the run it was served);
+    the per-item proposal is built here from the cached result. Without an
+    idempotency_key the job is keyed by the run, so every request for the same run
+    gets the one job.
+    """
+    check_report_permission()
+
+    filters = normalize_filters(filters)
+    run_token = run_token or get_run_token(filters)
+
+    result = get_run_result(run_token) if run_token else None
+    if not result:
+        if not filters:
+            frappe.throw(_("The report result has expired, please refresh the report"))
+
+        # expired: recompute once from the filters
+        execute(filters)
+        run_token = get_run_token(filters)
+        result = get_run_result(run_token)
+
+    items = get_material_request_proposal(result["data"], filters.get("company"))
+    if not items:
+        frappe.throw(_("No valid items with positive quantity to create Material Request."))
+
+    item_group_filter = item_group_filter or filters.get("item_group")
+    idempotency_key = idempotency_key or get_run_idempotency_key(run_token, item_group_filter)
+
+    return create_material_request_draft(items, item_group_filter, idempotency_key)
+
+
+def get_run_idempotency_key(run_token, item_group_filter=None):
+    key = f"{run_token}:{item_group_filter or ''}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def get_material_request_proposal(data, company=None):
+    """
+    Positive balance (or time-phased shortage) per company and item, as
+    create_material_request_draft items. Consolidated runs carry the company on
+    every row; company is used for rows without one.
+    """
+    item_totals = {}
+    for row in data:
+        item_code = row.get("item_code")
+        qty = flt(row.get("balance_qty") if "balance_qty" in row else row.get("shortage_qty"))
+
+        # Only include positive or required qtys
+        if item_code and qty > 0:
+            key = (row.get("company") or company, item_code)
+            item_totals[key] = item_totals.get(key, 0) + qty
+
+    return [
+        {"item_code": item_code, "qty": abs(qty), "company": company}
+        for (company, item_code), qty in item_totals.items()
+    ]
+
+
+@frappe.whitelist()
+def get_demand_sources(item_code, run_token=None, filters=None):
+    """Orders driving the demand for item_code in a cached report run, from its pegging index."""
+    check_report_permission()
+
+    run_token = run_token or get_run_token(filters)
+
+    pegging = get_run_pegging(run_token, item_code) if run_token else None
+    if pegging is None:
+        frappe.throw(_("The report result has expired, please refresh the report"))
+
+    return [
+        {"order": order, "production_item": production_item, "required_qty": qty}
+        for order, production_item, qty in pegging
+    ]
+
+
+REPORT_NAME = "Material Requirement Planning"
+
+
+def check_report_permission():
+    if not frappe.get_cached_doc("Report", REPORT_NAME).is_permitted():
+        frappe.throw(_("Not permitted to run {0}").format(REPORT_NAME), frappe.PermissionError)
+
+
+@frappe.whitelist()
+def get_material_request_job_status(idempotency_key):
+    return frappe.cache().get_value(f"mrp_material_request_job:{idempotency_key}")
+
+
+def _set_material_request_job_status(idempotency_key, **status):
+    status["idempotency_key"] = idempotency_key
+    frappe.cache().set_value(
+        f"mrp_material_request_job:{idempotency_key}", status, expires_in_sec=MATERIAL_REQUEST_JOB_TTL
+    )
+    return status
+
+
+def make_material_requests(items, item_group_filter=None, idempotency_key=None, user=None):
+    """
+    Background job: insert one Material Request per company and item group, committing every
+    MATERIAL_REQUEST_BATCH_SIZE requests and publishing progress to the user.
+    Groups finished by an earlier (failed) attempt with the same key are skipped, and
+    items committed just before a crash are skipped as already existing.
+    """
+    previous = get_material_request_job_status(idempotency_key) or {}
+    created_requests = list(previous.get("created_requests", []))
+    done_groups = set(previous.get("done_groups", []))
+
+    def update_status(status, **extra):
+        job_status = _set_material_request_job_status(
+            idempotency_key,
+            status=status,
+            attempt=previous.get("attempt", 1),
+            created_requests=created_requests,
+            done_groups=sorted(done_groups, key=str),
+            **extra,
+        )
+        frappe.publish_realtime(MATERIAL_REQUEST_PROGRESS_EVENT, job_status, user=user)
+
+    try:
+        grouped_items = {
+            group: group_items
+            for group, group_items in build_material_request_groups(items, item_group_filter).items()
+            if group not in done_groups
+        }
+
+        if not grouped_items:
+            update_status(
+                "completed",
+                message=_("All items already exist in existing Material Requests."),
+                progress=100,
+            )
+            return
+
+        total = len(grouped_items)
+        batch = []
+
+        # Create new MR for each company and item_group
+        for count, ((company, item_group), group_items) in enumerate(grouped_items.items(), 1):
+            mr = frappe.new_doc("Material Request")
+            mr.material_request_type = "Purchase"
+            if company:
+                mr.company = company
+            mr.transaction_date = nowdate()
+            mr.schedule_date = nowdate()
+
+            for item in group_items:
+                mr.append("items", {
+                    "item_code": item["item_code"],
+                    "qty": item["qty"],
+                    "schedule_date": nowdate(),
+                    "item_group": item_group,
+                })
+
+            mr.insert(ignore_permissions=True)
+            batch.append(((company, item_group), mr.name))
+
+            if len(batch) == MATERIAL_REQUEST_BATCH_SIZE or count == total:
+                frappe.db.commit()
+                done_groups.update(group for group, _name in batch)
+                created_requests.extend(name for _group, name in batch)
+                batch = []
+                update_status("running", progress=int(count * 100 / total))
+
+        update_status("completed", message=_("Material Requests created successfully."), progress=100)
+
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title=_("Material Request creation failed"))
+        update_status("failed", message=_("Material Request creation failed, please retry."))
+
+
+def build_material_request_groups(items, item_group_filter=None):
+    """
+    {(company, item_group): [items]} for the proposed items not already in an open
+    Material Request of their company (of any company for items without one).
+    """
+    items = [
+        item for item in items
+        if isinstance(item, dict) and item.get("item_code") and item.get("qty") > 0
+    ]
+    if not items:
+        return {}
+
+    item_codes = list({item["item_code"] for item in items})
+
+    # Fetch existing (non-cancelled) Material Request Items of the proposed items
     existing_items = frappe.db.sql("""
         SELECT 
+            mr.company,
             mri.item_code, 
-            mri.qty,
-            i.item_group
+            mri.qty
         FROM `tabMaterial Request Item` mri
         INNER JOIN `tabMaterial Request` mr ON mr.name = mri.parent
-        INNER JOIN `tabItem` i ON i.name = mri.item_code
-        WHERE mr.docstatus < 2
-    """, as_dict=True)
+        WHERE mri.item_code IN %(item_codes)s AND mr.docstatus < 2
+    """, {"item_codes": item_codes}, as_dict=True)
 
     # Convert to a lookup set for quick skip check
-    existing_set = {(d.item_code, float(d.qty)) for d in existing_items}
+    existing_set = set()
+    for d in existing_items:
+        existing_set.add((d.company, d.item_code, float(d.qty)))
+        existing_set.add((None, d.item_code, float(d.qty)))
+
+    # Item groups for all items in one query
+    item_groups = {}
+    if not item_group_filter:
+        item_groups = dict(frappe.get_all(
+            "Item",
+            fields=["name", "item_group"],
+            filters={"name": ("in", item_codes)},
+            as_list=True,
+        ))
 
     # Group new items by item_group
     grouped_items = {}
     for item in items:
-        if not (isinstance(item, dict) and item.get("item_code") and item.get("qty") > 0):
-            continue
-
-        item_group = item_group_filter or frappe.db.get_value("Item", item["item_code"], "item_group")
-        item_key = (item["item_code"], float(item["qty"]))
+        item_group = item_group_filter or item_groups.get(item["item_code"])
+        company = item.get("company")
+        item_key = (company, item["item_code"], float(item["qty"]))
 
         # Skip items that already exist with same qty
         if item_key in existing_set:
             # frappe.logger().info(f"Skipping {item['item_code']} (qty: {item['qty']}) — already in existing MR.")
             continue
 
-        grouped_items.setdefault(item_group, []).append(item)
-
-    if not grouped_items:
-        return _("All items already exist in existing Material Requests.")
-
-    created_requests = []
-
-    # Create new MR for each item_group
-    for item_group, group_items in grouped_items.items():
-        mr = frappe.new_doc("Material Request")
-        mr.material_request_type = "Purchase"
-        mr.transaction_date = nowdate()
-        mr.schedule_date = nowdate()
+        grouped_items.setdefault((company, item_group), []).append(item)
 
-        for item in group_items:
-            mr.append("items", {
-                "item_code": item["item_code"],
-                "qty": item["qty"],
-                "schedule_date": nowdate(),
-                "item_group": item_group,
-            })
+    return grouped_items
 
-        mr.insert(ignore_permissions=True)
-        created_requests.append(mr.name)
+# what get_inputs / set_inputs carry between a run and its delta refresh (fiabila_customization.mrp.delta)
+INPUT_FIELDS = (
+	"orders",
+	"raw_materials_dict",
+	"item_codes",
+	"warehouses",
+	"item_details",
+	"mrp_warehouses",
+	"bin_details",
+	"purchase_details",
+	"parent_warehouse_map",
+)
 
-    return {
-        "message": _("Material Requests created successfully."),
-        "created_requests": created_requests
-    }
 
 class ProductionPlanReport:
+	# set by ConsolidatedPlanReport to load the orders of several companies
+	companies = None
+	# set by ConsolidatedPlanReport: get_time_phased_supply lines read once for all companies
+	time_phased_supply = None
+
 	def __init__(self, filters=None):
 		self.filters = frappe._dict(filters or {})
 		self.raw_materials_dict = {}
 		self.data = []
+		# raw material -> [(order, production item, required qty)], filled while netting
+		self.pegging = {}
+		# pickled get_inputs() as loaded, when kept for delta refreshes
+		self.input_snapshot = None
 		
 
 	def execute_report(self):
 		# Step 1: Prepare all base data
+		self.load_inputs()
+		return self.build_data()
+
+	def load_inputs(self):
 		self.get_open_orders()
 		self.get_raw_materials()
 		self.get_item_details()
 		self.get_bin_details()
 		self.get_purchase_details()
+
+	def get_inputs(self):
+		"""The loaded inputs, before build_data nets (and mutates) them."""
+		return {field: getattr(self, field, None) for field in INPUT_FIELDS}
+
+	def set_inputs(self, inputs):
+		for field, value in inputs.items():
+			if value is not None:
+				setattr(self, field, value)
+
+	def reload_items(self, item_codes):
+		"""Re-read stock, Bin, Purchase Order and Item Default data of item_codes into the loaded inputs."""
+		item_codes = list(set(item_codes))
+		if not (self.orders and self.raw_materials_dict and item_codes):
+			return
+
+		self.get_item_details(item_codes)
+		self.get_bin_details(item_codes)
+		self.get_purchase_details(item_codes)
+
+		touched = set(item_codes)
+		rows = [d for rows in self.raw_materials_dict.values() for d in rows if d.item_code in touched]
+		if rows:
+			self.set_raw_material_stock(rows, list({d.item_code for d in rows}))
+
+	def build_data(self):
+		if self.filters.time_phased:
+			self.prepare_time_phased_data()
+			return self.columns, self.data
+
 		self.prepare_data()
 		self.get_columns()
 
 		# Step 2: Filter data if item_group filter is applied
 		if self.filters.item_group:
+			item_group_items = self.get_item_group_items()
 			self.data = [
 				row for row in self.data
-				if row.get('item_code')
-				and frappe.db.get_value("Item", row.get('item_code'), "item_group") == self.filters.item_group
+				if row.get('item_code') and row.get('item_code') in item_group_items
 			]
 
 		# Step 3: Aggregate duplicate raw materials BEFORE zeroing stock
 		self.aggregate_duplicate_raw_materials()
 
-		seen_fg_raw_material = []
-
-		# for row in self.data:
-		# 	rm_item = row.get("item_code")
-		# 	so_no = row.get("name")
-		# 	if not rm_item:
-		# 		continue
-			
-		# 	if rm_item not in seen_fg_raw_material:
-		# 		seen_fg_raw_material.append(rm_item)
-		# 	else:
-		# 		for field in list(row.keys()):
-		# 			if field.startswith("stock_"):
-		# 				row[field] = 0.0
-		# 		row["po_qty"] = 0.0
-		
+		if self.filters.sparse_stock_columns or self.filters.compact_stock:
+			self.sparsify_stock_columns()
 
 		return self.columns, self.data
 
-	
-
 	def get_open_orders(self):
 		doctype, order_by = self.filters.based_on, self.filters.order_by
 
@@ -217,7 +570,10 @@ class ProductionPlanReport:
 
 		query = query.where(parent.docstatus == 1)
 
-		if self.filters.company:
+		if self.companies:
+			# consolidated run, netted per company afterwards (fiabila_customization.mrp.consolidated)
+			query = query.select(parent.company).where(parent.company.isin(self.companies))
+		elif self.filters.company:
 			query = query.where(parent.company == self.filters.company)
    
 		if doctype == "Sales Order":
@@ -275,6 +631,76 @@ class ProductionPlanReport:
 				# row["item_code"] = " "
 				# row["raw_material_name"] = " "
 
+	def iter_report_rows(self):
+		"""
+		Lazy counterpart of execute_report for exports: yields the same rows in the same order
+		without keeping them. Aggregation needs per-item totals up front, so the netting runs
+		twice against a snapshot of the mutable inputs; only the inputs are held in memory.
+		With sparse_stock_columns the first pass also finds the stock columns to drop.
+		compact_stock only changes how the rows are sent to the browser, stock cells are kept.
+		"""
+		self.load_inputs()
+		self.get_columns()
+
+		item_group_items = self.get_item_group_items()
+		snapshot = copy.deepcopy(
+			(self.orders, self.raw_materials_dict, getattr(self, "bin_details", None))
+		)
+
+		def filtered_rows():
+			for row in self.iter_prepared_rows():
+				if item_group_items is None or row.get("item_code") in item_group_items:
+					yield row
+
+		stock_fields = [c["fieldname"] for c in self.columns if c["fieldname"].startswith("stock_")]
+		used_stock_fields = set()
+
+		totals = {}
+		for row in filtered_rows():
+			if row.get("item_code"):
+				totals[row.item_code] = totals.get(row.item_code, 0) + (row.get("required_qty", 0) or 0)
+			if self.filters.sparse_stock_columns:
+				used_stock_fields.update(fieldname for fieldname in stock_fields if row.get(fieldname))
+
+		zero_fields = set()
+		if self.filters.sparse_stock_columns:
+			zero_fields = set(stock_fields) - used_stock_fields
+			self.columns = [c for c in self.columns if c["fieldname"] not in zero_fields]
+
+		self.orders, self.raw_materials_dict, self.bin_details = snapshot
+
+		seen = set()
+		for row in filtered_rows():
+			item_code = row.get("item_code")
+			if item_code in totals:
+				if item_code not in seen:
+					seen.add(item_code)
+					row["required_qty"] = totals[item_code]
+					row["balance_qty"] = self.calculate_balance_qty(row)
+				else:
+					row["required_qty"] = 0.0
+					row["balance_qty"] = 0.0
+			for fieldname in zero_fields:
+				row.pop(fieldname, None)
+			yield row
+
+	def get_item_group_items(self):
+		"""Items of the filtered item group among the report's items, or None when not filtering."""
+		if not self.filters.item_group:
+			return None
+
+		item_codes = list(set(getattr(self, "item_codes", None) or []))
+		if not item_codes:
+			return set()
+
+		return set(
+			frappe.get_all(
+				"Item",
+				filters={"name": ("in", item_codes), "item_group": self.filters.item_group},
+				pluck="name",
+			)
+		)
+
 
     
 	def get_raw_materials(self):
@@ -309,9 +735,13 @@ class ProductionPlanReport:
 			self.warehouses.extend([d.source_warehouse for d in raw_materials if d.source_warehouse])
 
 		else:
+			default_boms = self.get_default_boms(
+				[d.production_item for d in self.orders if not d.bom_no]
+			)
+
 			bom_nos = []
 			for d in self.orders:
-				bom_no = d.bom_no or frappe.get_cached_value("Item", d.production_item, "default_bom")
+				bom_no = d.bom_no or default_boms.get(d.production_item)
 				if not d.bom_no:
 					d.bom_no = bom_no
 				if bom_no:
@@ -320,6 +750,15 @@ class ProductionPlanReport:
 			if not bom_nos:
 				return
 
+			# Multi-level explosions of active default BOMs are pre-computed
+			# (fiabila_customization.mrp.bom_requirements); only the rest is exploded live
+			if not self.filters.include_subassembly_raw_materials:
+				for parent_bom, rows in get_bom_requirements(bom_nos).items():
+					self.item_codes.extend(row.item_code for row in rows)
+					self.raw_materials_dict[parent_bom] = rows
+
+				bom_nos = [bom_no for bom_no in bom_nos if bom_no not in self.raw_materials_dict]
+
 			bom_item_doctype = (
 				"BOM Explosion Item" if self.filters.include_subassembly_raw_materials else "BOM Item"
 			)
@@ -343,66 +782,29 @@ class ProductionPlanReport:
 			if frappe.db.has_column(bom_item_doctype, "bom_no"):
 				select_fields.append(bom_item.bom_no)
 
-			raw_materials = (
-				frappe.qb.from_(bom)
-				.from_(bom_item)
-				.select(*select_fields)
-				.where(
-					(bom_item.parent.isin(bom_nos))
-					& (bom_item.parent == bom.name)
-					& (bom.docstatus == 1)
-				)
-			).run(as_dict=True)
-			
-			# Recursive function to fetch all nested BOM items with proper qty calculation
-			def fetch_child_bom_items(parent_bom, bom_no, parent_multiplier=1.0):
-				"""
-				Recursively fetch all raw materials from a BOM and its child BOMs.
-				parent_multiplier: The cumulative quantity multiplier from parent BOMs
-				"""
-				bom_quantity = frappe.get_cached_value("BOM", bom_no, "quantity") or 1
-				child_items = frappe.get_all(
-					"BOM Item",
-					fields=[
-						"parent",
-						"item_code",
-						"item_name as raw_material_name",
-						"qty as required_qty_per_unit",
-						"bom_no",
-					],
-					filters={"parent": bom_no, "docstatus": 1},
-				)
-
-				for child in child_items:
-					if not child.item_code:
-						continue
-
-					# Calculate the required_qty_per_unit considering parent multiplier
-					child_qty_per_unit = child["required_qty_per_unit"] / bom_quantity
-					cumulative_multiplier = parent_multiplier * child_qty_per_unit
-
-					# Assign parent_bom as top-level FG
-					child["parent"] = parent_bom
-					child["required_qty_per_unit"] = cumulative_multiplier
-					
-					self.item_codes.append(child.item_code)
-					self.raw_materials_dict[parent_bom].append(child)
-
-					# Recurse if child has its own BOM (sub-assembly)
-					if child.get("bom_no"):
-						# Pass the cumulative multiplier to calculate nested quantities correctly
-						fetch_child_bom_items(parent_bom, child["bom_no"], cumulative_multiplier)
-
-			# Fetch child items recursively for all top-level BOMs
-			for d in raw_materials:
-				parent_bom = d.parent
-				self.raw_materials_dict.setdefault(parent_bom, [])
-				self.raw_materials_dict[parent_bom].append(d)
-
-				linked_bom = d.get("bom_no")
-				if linked_bom:
-					# Pass the parent's required_qty_per_unit as the initial multiplier
-					fetch_child_bom_items(parent_bom, linked_bom, d.required_qty_per_unit)
+			raw_materials = []
+			if bom_nos:
+				raw_materials = (
+					frappe.qb.from_(bom)
+					.from_(bom_item)
+					.select(*select_fields)
+					.where(
+						(bom_item.parent.isin(bom_nos))
+						& (bom_item.parent == bom.name)
+						& (bom.docstatus == 1)
+					)
+					.orderby(bom_item.parent)
+					.orderby(bom_item.idx)
+				).run(as_dict=True)
+
+			# Expand sub-assemblies from a prefetched BOM graph (one query pair per BOM level);
+			# large runs are exploded in worker processes, see fiabila_customization.mrp.sharding
+			bom_snapshot = get_bom_snapshot(d.bom_no for d in raw_materials if d.get("bom_no"))
+
+			for parent_bom, rows in explode_sharded(raw_materials, bom_snapshot).items():
+				rows = [frappe._dict(row) for row in rows]
+				self.item_codes.extend(row.item_code for row in rows)
+				self.raw_materials_dict[parent_bom] = rows
 						
 		if self.filters.based_on == "Sales Order":
 			flattened_list = [item for sublist in self.raw_materials_dict.values() for item in sublist]
@@ -412,46 +814,7 @@ class ProductionPlanReport:
 			flattened_list = sorted(flattened_list, key=lambda x: x['parent'])
 
 			self.item_codes.extend([d.item_code for d in flattened_list if d.item_code])
-			warehouse_stock = self.get_warehouse_item_stock(item_codes=self.item_codes)
-
-			warehouse_lookup = {wh["item_code"]: wh for wh in warehouse_stock}
-
-			# global_seen_items = set()
-			stock_fields = set()
-			
-			if warehouse_stock:
-				sample = warehouse_stock[0]
-				stock_fields = {k for k in sample.keys() if k != "item_code"}
-
-			for d in flattened_list:
-				item_code = d.item_code
-				stock_info = {field: 0.0 for field in stock_fields}		
-
-				# First occurrence → update actual warehouse stock
-				# if item_code not in global_seen_items and item_code in warehouse_lookup:
-				# 	stock_info.update(warehouse_lookup[item_code])
-				# 	po_qty_data = frappe.db.sql("""
-				# 		SELECT SUM(poi.qty) as po_qty
-				# 		FROM `tabPurchase Order Item` poi
-				# 		JOIN `tabPurchase Order` po ON po.name = poi.parent
-				# 		WHERE poi.item_code = %s AND po.status = 'To Receive and Bill'
-				# 	""", (item_code,), as_dict=True)
-				# 	stock_info["po_qty"] = po_qty_data[0].get('po_qty') if po_qty_data[0].get('po_qty') is not None else 0.0
-					
-				# 	global_seen_items.add(item_code)
-				
-				if item_code in warehouse_lookup:
-					stock_info.update(warehouse_lookup[item_code])
-
-					po_qty_data = frappe.db.sql("""
-						SELECT SUM(poi.qty) as po_qty
-						FROM `tabPurchase Order Item` poi
-						JOIN `tabPurchase Order` po ON po.name = poi.parent
-						WHERE poi.item_code = %s AND po.status = 'To Receive and Bill'
-					""", (item_code,), as_dict=True)
-
-					stock_info["po_qty"] = po_qty_data[0].get('po_qty') if po_qty_data[0].get('po_qty') is not None else 0.0
-				d.update(stock_info)
+			self.set_raw_material_stock(flattened_list, self.item_codes)
 
 		elif self.filters.based_on == "Work Order":
 			if not raw_materials:
@@ -459,89 +822,128 @@ class ProductionPlanReport:
 
 			raw_materials = sorted(raw_materials, key=lambda x: x['parent'])
 			self.item_codes.extend([d.item_code for d in raw_materials])
-			warehouse_stock = self.get_warehouse_item_stock(item_codes=self.item_codes)
+			self.set_raw_material_stock(raw_materials, self.item_codes)
 
-			warehouse_lookup = {wh["item_code"]: wh for wh in warehouse_stock}
+			for d in raw_materials:
+				# Add to Work Order grouping
+				self.raw_materials_dict.setdefault(d.parent, []).append(d)
 
-			global_seen_items = set()
-			stock_fields = set()
-			if warehouse_stock:
-				sample = warehouse_stock[0]
-				stock_fields = {k for k in sample.keys() if k != "item_code"}
+	def set_raw_material_stock(self, rows, item_codes):
+		"""Merge the parent warehouse stock and open PO qty of item_codes into their raw material rows."""
+		warehouse_stock = self.get_warehouse_item_stock(item_codes=item_codes)
 
-			for d in raw_materials:
-				item_code = d.item_code
-				parent = d.parent
-
-				self.raw_materials_dict.setdefault(parent, [])
-				stock_info = {field: 0.0 for field in stock_fields}
-
-				# First time seen → update with actual warehouse stock
-				# if item_code not in global_seen_items and item_code in warehouse_lookup:
-				if item_code in warehouse_lookup:
-					stock_info.update(warehouse_lookup[item_code])
-					
-					po_qty_data = frappe.db.sql("""
-						SELECT SUM(poi.qty) as po_qty
-						FROM `tabPurchase Order Item` poi
-						JOIN `tabPurchase Order` po ON po.name = poi.parent
-						WHERE poi.item_code = %s AND po.status = 'To Receive and Bill'
-					""", (item_code,), as_dict=True)
-					stock_info["po_qty"] = po_qty_data[0].get('po_qty') if po_qty_data[0].get('po_qty') is not None else 0.0
-
-					# global_seen_items.add(item_code)
-
-				# Merge stock info into raw material row
-				d.update(stock_info)
+		warehouse_lookup = {wh["item_code"]: wh for wh in warehouse_stock}
+		po_qty_map = self.get_open_po_qty(list(warehouse_lookup))
 
-				# Add to Work Order grouping
-				self.raw_materials_dict[parent].append(d)
+		stock_fields = set()
+		if warehouse_stock:
+			sample = warehouse_stock[0]
+			stock_fields = {k for k in sample.keys() if k != "item_code"}
+
+		for d in rows:
+			stock_info = {field: 0.0 for field in stock_fields}
+			if d.item_code in warehouse_lookup:
+				stock_info.update(warehouse_lookup[d.item_code])
+				stock_info["po_qty"] = po_qty_map.get(d.item_code) or 0.0
+			d.update(stock_info)
 
-	def get_item_details(self):
+	def get_item_details(self, item_codes=None):
+		"""Item Defaults of the report's items; with item_codes, re-read just those."""
 		if not (self.orders and self.item_codes):
 			return
 
-		self.item_details = {}
+		if item_codes is None:
+			item_codes = self.item_codes
+			self.item_details = {}
+		else:
+			for item_code in item_codes:
+				self.item_details.pop(item_code, None)
+
 		for d in frappe.get_all(
 			"Item Default",
 			fields=["parent", "default_warehouse"],
-			filters={"company": self.filters.company, "parent": ("in", self.item_codes)},
+			filters={"company": self.filters.company, "parent": ("in", item_codes)},
 		):
 			self.item_details[d.parent] = d
 
-	def get_bin_details(self):
+	def get_default_boms(self, item_codes):
+		if not item_codes:
+			return {}
+
+		return {
+			d.name: d.default_bom
+			for d in frappe.get_all(
+				"Item", fields=["name", "default_bom"], filters={"name": ("in", list(set(item_codes)))}
+			)
+		}
+
+	def get_open_po_qty(self, item_codes):
+		"""Ordered qty on Purchase Orders still to be received, per item, in one query."""
+		if not item_codes:
+			return {}
+
+		po_qty = frappe.db.sql("""
+			SELECT poi.item_code, SUM(poi.qty) as po_qty
+			FROM `tabPurchase Order Item` poi
+			JOIN `tabPurchase Order` po ON po.name = poi.parent
+			WHERE poi.item_code IN %(item_codes)s AND po.status = 'To Receive and Bill'
+			GROUP BY poi.item_code
+		""", {"item_codes": item_codes}, as_dict=True)
+
+		return {d.item_code: d.po_qty for d in po_qty}
+
+	def get_bin_details(self, item_codes=None):
+		"""Bins of the report's items and warehouses; with item_codes, re-read just those items."""
 		if not (self.orders and self.raw_materials_dict):
 			return
 
-		self.bin_details = {}
-		self.mrp_warehouses = []
-		if self.filters.raw_material_warehouse:
-			self.mrp_warehouses.extend(get_child_warehouses(self.filters.raw_material_warehouse))
-			self.warehouses.extend(self.mrp_warehouses)
+		if item_codes is None:
+			item_codes = self.item_codes
+			self.bin_details = {}
+			self.mrp_warehouses = []
+			if self.filters.raw_material_warehouse:
+				self.mrp_warehouses.extend(get_child_warehouses(self.filters.raw_material_warehouse))
+				self.warehouses.extend(self.mrp_warehouses)
+		else:
+			touched = set(item_codes)
+			self.bin_details = {key: d for key, d in self.bin_details.items() if key[0] not in touched}
 
 		for d in frappe.get_all(
 			"Bin",
 			fields=["warehouse", "item_code", "actual_qty", "ordered_qty", "projected_qty"],
-			filters={"item_code": ("in", self.item_codes), "warehouse": ("in", self.warehouses)},
+			filters={"item_code": ("in", item_codes), "warehouse": ("in", self.warehouses)},
 		):
 			key = (d.item_code, d.warehouse)
 			if key not in self.bin_details:
 				self.bin_details.setdefault(key, d)
+
+		if self.filters.as_of_date:
+			# net against the stock at the end of the as-of date instead of the current stock
+			stock = get_stock_as_of(self.filters.as_of_date, item_codes, self.warehouses)
+			touched = set(item_codes)
+			for key, d in self.bin_details.items():
+				if key[0] in touched:
+					d.actual_qty = stock.get(key, 0)
 	
 
 
-	def get_purchase_details(self):
+	def get_purchase_details(self, item_codes=None):
 		
 		if not (self.orders and self.raw_materials_dict):
 			return
 
-		self.purchase_details = {}
+		if item_codes is None:
+			item_codes = self.item_codes
+			self.purchase_details = {}
+		else:
+			for item_code in item_codes:
+				self.purchase_details.pop(item_code, None)
 		
 		purchased_items = frappe.get_all(
 			"Purchase Order Item",
 			fields=["item_code", "min(schedule_date) as arrival_date", "qty as arrival_qty", "warehouse"],
 			filters={
-				"item_code": ("in", self.item_codes),
+				"item_code": ("in", item_codes),
 				"docstatus": 1,
 				"received_qty":0
 			},
@@ -575,42 +977,33 @@ class ProductionPlanReport:
 		
 		# warehouses = frappe.get_all("Warehouse", filters={"disabled": 0}, pluck="name")
 
-		bins = frappe.get_all(
-			"Bin",
-			fields=["item_code", "warehouse", "actual_qty"],
-			filters={"item_code": ("in", item_codes)}
-		)
+		if self.filters.as_of_date:
+			stock_map = get_stock_as_of(self.filters.as_of_date, item_codes)
+		else:
+			bins = frappe.get_all(
+				"Bin",
+				fields=["item_code", "warehouse", "actual_qty"],
+				filters={"item_code": ("in", item_codes)}
+			)
 
-	
-		stock_map = {(b.item_code, b.warehouse): b.actual_qty for b in bins}
+			stock_map = {(b.item_code, b.warehouse): b.actual_qty for b in bins}
 		# New: Get parent warehouse mappings
 		parent_warehouse_map = self.get_parent_warehouses_with_children()
 
-		
-		report_data = []
-
-		for item in item_codes:
-			row = {"item_code": item}
-			# New: Sum child warehouse quantities under parent
-			#  CORRECT CODE:
-			for parent_wh, child_warehouses in parent_warehouse_map.items():
-				total_qty = 0
-				for child_wh in child_warehouses:
-					# Access using tuple key (item_code, warehouse)
-					total_qty += stock_map.get((item, child_wh), 0)
-				
-				row[f"stock_{frappe.scrub(parent_wh)}"] = total_qty
-			# for wh in warehouses:
-				
-			# 	row[f"stock_{frappe.scrub(wh)}"] = stock_map.get((item, wh), 0)
-			report_data.append(row)
-		
-		return report_data
+		# Sum child warehouse quantities under each parent, one row per distinct item
+		return pivot_warehouse_stock(
+			list(dict.fromkeys(item_codes)), stock_map, parent_warehouse_map
+		)
 
 			
 
 
 	def prepare_data(self):
+		self.data.extend(self.iter_prepared_rows())
+
+	def iter_prepared_rows(self):
+		"""Yield report rows order by order; prepare_data collects them into self.data."""
+		self.pegging = {}
 		if not self.orders:
 			return
 
@@ -633,7 +1026,7 @@ class ProductionPlanReport:
 
 				bin_data["actual_qty"] -= d.available_qty
 
-			self.update_raw_materials(d, key)
+			yield from self.update_raw_materials(d, key)
    
 	def calculate_balance_qty(self, row):
 		
@@ -661,21 +1054,12 @@ class ProductionPlanReport:
 			if self.filters.based_on != "Work Order":
 				d.required_qty = d.required_qty_per_unit * data.qty_to_manufacture
 
-			if not warehouses:
-				warehouses = [data.warehouse]
+			self.pegging.setdefault(d.item_code, []).append((data.name, data.production_item, d.required_qty))
 
-			if self.filters.based_on == "Work Order" and d.warehouse:
-				warehouses = [d.warehouse]
-			else:
-				item_details = self.item_details.get(d.item_code)
-				if item_details:
-					warehouses = [item_details["default_warehouse"]]
-
-			if self.filters.raw_material_warehouse:
-				warehouses = get_child_warehouses(self.filters.raw_material_warehouse)
+			warehouses = self.get_raw_material_warehouses(data, d, warehouses)
 
 			d.remaining_qty = d.required_qty
-			self.pick_materials_from_warehouses(d, data, warehouses)
+			yield from self.pick_materials_from_warehouses(d, data, warehouses)
 
 			if d.remaining_qty and self.filters.raw_material_warehouse and d.remaining_qty != d.required_qty:
 				row = self.get_args()
@@ -683,7 +1067,25 @@ class ProductionPlanReport:
 				d.required_qty = d.remaining_qty
 				d.allotted_qty = 0
 				row.update(d)
-				self.data.append(row)
+				yield row
+
+	def get_raw_material_warehouses(self, order, d, warehouses):
+		"""Warehouses to pick raw material d from, in order; warehouses is the previous row's choice."""
+		if not warehouses:
+			warehouses = [order.warehouse]
+
+		if self.filters.based_on == "Work Order" and d.warehouse:
+			warehouses = [d.warehouse]
+		else:
+			item_details = self.item_details.get(d.item_code)
+			if item_details:
+				warehouses = [item_details["default_warehouse"]]
+
+		if self.filters.raw_material_warehouse:
+			# children of raw_material_warehouse, resolved once in get_bin_details
+			warehouses = list(self.mrp_warehouses)
+
+		return warehouses
 
 	def pick_materials_from_warehouses(self, args, order_data, warehouses):
 		for index, warehouse in enumerate(warehouses):
@@ -723,7 +1125,7 @@ class ProductionPlanReport:
 			
 				row.balance_qty = self.calculate_balance_qty(row)
 
-				self.data.append(row)
+				yield row
 
 	def get_args(self):
 		return frappe._dict(
@@ -736,8 +1138,194 @@ class ProductionPlanReport:
 				"produced_qty": "",
 			}
 		)
-	
-	
+
+	def prepare_time_phased_data(self):
+		"""Net demand against stock and open POs per period instead of in total."""
+		self.data = []
+		period = self.filters.period or "Week"
+		periods = frappe.utils.cint(self.filters.periods) or 12
+
+		demand = self.get_time_phased_demand()
+		item_codes = list(set(demand[0]))
+
+		if item_codes and self.filters.item_group:
+			item_codes = frappe.get_all(
+				"Item",
+				filters={"name": ("in", item_codes), "item_group": self.filters.item_group},
+				pluck="name",
+			)
+			allowed = set(item_codes)
+			lines = [line for line in zip(*demand, strict=True) if line[0] in allowed]
+			demand = tuple(map(list, zip(*lines, strict=True))) if lines else ([], [], [])
+
+		if not item_codes:
+			self.get_time_phased_columns([])
+			return
+
+		plan = build_time_phased_plan(
+			demand,
+			self.get_time_phased_supply(item_codes),
+			self.get_time_phased_opening(item_codes),
+			frappe.utils.getdate(self.filters.as_of_date or nowdate()),
+			period,
+			periods,
+		)
+		self.get_time_phased_columns(plan["period_starts"])
+
+		period_fields = [f"period_{i}" for i in range(len(plan["period_starts"]))]
+		period_labels = [str(d) for d in plan["period_starts"]]
+
+		for item_code, opening, demand_qty, supply_qty, projected, shortage, first_shortage in zip(
+			plan["item_codes"].tolist(),
+			plan["opening"].tolist(),
+			plan["demand"].tolist(),
+			plan["supply"].tolist(),
+			plan["projected"].round(6).tolist(),
+			plan["shortage_qty"].tolist(),
+			plan["first_shortage"].tolist(),
+			strict=True,
+		):
+			row = {
+				"item_code": item_code,
+				"raw_material_name": self.raw_material_names.get(item_code),
+				"opening_qty": opening,
+				"required_qty": demand_qty,
+				"po_qty": supply_qty,
+				"shortage_qty": shortage,
+				"first_shortage": period_labels[first_shortage] if first_shortage >= 0 else "",
+			}
+			row.update(zip(period_fields, projected, strict=True))
+			self.data.append(row)
+
+	def get_time_phased_demand(self):
+		"""Dated raw material demand, one line per order and raw material."""
+		date_field = {
+			"Sales Order": "delivery_date",
+			"Material Request": "schedule_date",
+			"Work Order": "planned_start_date",
+		}.get(self.filters.based_on)
+
+		self.raw_material_names = {}
+		self.pegging = {}
+		item_codes, dates, qtys = [], [], []
+
+		for d in self.orders:
+			key = d.name if self.filters.based_on == "Work Order" else d.bom_no
+			order_date = d.get(date_field)
+
+			for rm in self.raw_materials_dict.get(key) or []:
+				if self.filters.based_on == "Work Order":
+					qty = rm.required_qty
+				else:
+					qty = rm.required_qty_per_unit * (d.qty_to_manufacture or 0)
+
+				item_codes.append(rm.item_code)
+				dates.append(order_date)
+				qtys.append(qty or 0)
+				self.raw_material_names.setdefault(rm.item_code, rm.raw_material_name)
+				self.pegging.setdefault(rm.item_code, []).append((d.name, d.production_item, qty or 0))
+
+		return item_codes, dates, qtys
+
+	def get_time_phased_supply(self, item_codes):
+		"""Pending Purchase Order quantity (in stock UOM) by schedule date."""
+		if self.time_phased_supply is not None:
+			wanted = set(item_codes)
+			lines = [line for line in zip(*self.time_phased_supply, strict=True) if line[0] in wanted]
+			return tuple(map(list, zip(*lines, strict=True))) if lines else ([], [], [])
+
+		po = frappe.qb.DocType("Purchase Order")
+		poi = frappe.qb.DocType("Purchase Order Item")
+
+		purchase_lines = (
+			frappe.qb.from_(poi)
+			.join(po)
+			.on(po.name == poi.parent)
+			.select(
+				poi.item_code,
+				poi.schedule_date,
+				((poi.qty - poi.received_qty) * poi.conversion_factor).as_("pending_qty"),
+			)
+			.where(
+				(poi.item_code.isin(item_codes))
+				& (po.docstatus == 1)
+				& (po.status.notin(["Closed", "Completed", "On Hold"]))
+				& (poi.qty > poi.received_qty)
+			)
+		).run(as_dict=True)
+
+		return (
+			[d.item_code for d in purchase_lines],
+			[d.schedule_date for d in purchase_lines],
+			[d.pending_qty for d in purchase_lines],
+		)
+
+	def get_time_phased_opening(self, item_codes):
+		"""On-hand qty per item (now, or at the as-of date) over the warehouses the report covers."""
+		if self.filters.raw_material_warehouse:
+			warehouses = get_child_warehouses(self.filters.raw_material_warehouse)
+		else:
+			warehouses = {
+				wh for children in self.get_parent_warehouses_with_children().values() for wh in children
+			}
+
+		if not warehouses:
+			return {}
+
+		if self.filters.as_of_date:
+			opening = {}
+			for (item_code, _warehouse), qty in get_stock_as_of(
+				self.filters.as_of_date, item_codes, list(warehouses)
+			).items():
+				opening[item_code] = opening.get(item_code, 0) + qty
+			return opening
+
+		bins = frappe.get_all(
+			"Bin",
+			fields=["item_code", "sum(actual_qty) as actual_qty"],
+			filters={"item_code": ("in", item_codes), "warehouse": ("in", list(warehouses))},
+			group_by="item_code",
+		)
+		return {d.item_code: d.actual_qty for d in bins}
+
+	def get_time_phased_columns(self, period_starts):
+		self.columns = [
+			{
+				"label": _("Raw Material Code"),
+				"fieldname": "item_code",
+				"fieldtype": "Link",
+				"options": "Item",
+				"width": 120,
+			},
+			{
+				"label": _("Raw Material Name"),
+				"fieldname": "raw_material_name",
+				"fieldtype": "Data",
+				"width": 130,
+			},
+			{"label": _("Opening Qty"), "fieldname": "opening_qty", "fieldtype": "Float", "width": 100},
+			{"label": _("Required Qty"), "fieldname": "required_qty", "fieldtype": "Float", "width": 100},
+			{"label": _("PO Qty"), "fieldname": "po_qty", "fieldtype": "Float", "width": 100},
+		]
+
+		for i, period_start in enumerate(period_starts):
+			self.columns.append(
+				{
+					"label": frappe.format(period_start, {"fieldtype": "Date"}),
+					"fieldname": f"period_{i}",
+					"fieldtype": "Float",
+					"width": 100,
+				}
+			)
+
+		self.columns.extend(
+			[
+				{"label": _("Shortage Qty"), "fieldname": "shortage_qty", "fieldtype": "Float", "width": 110},
+				{"label": _("First Shortage"), "fieldname": "first_shortage", "fieldtype": "Date", "width": 110},
+			]
+		)
+
+
 
 	def get_columns(self):
 		based_on = self.filters.based_on
@@ -844,23 +1432,58 @@ class ProductionPlanReport:
 		  ]
 		)
 
+	def sparsify_stock_columns(self):
+		"""
+		sparse_stock_columns: drop the stock columns that are zero on every row.
+		compact_stock: leave zero stock cells out of the rows (the client renders them as 0).
+		"""
+		stock_fields = [c["fieldname"] for c in self.columns if c["fieldname"].startswith("stock_")]
+		zero_fields = set()
+
+		if self.filters.sparse_stock_columns:
+			used = {fieldname for row in self.data for fieldname in stock_fields if row.get(fieldname)}
+			zero_fields = set(stock_fields) - used
+			self.columns = [c for c in self.columns if c["fieldname"] not in zero_fields]
+
+		for row in self.data:
+			for fieldname in stock_fields:
+				if fieldname in zero_fields or (self.filters.compact_stock and not row.get(fieldname)):
+					row.pop(fieldname, None)
+
 	def get_parent_warehouses_with_children(self):
+		if getattr(self, "parent_warehouse_map", None) is not None:
+			return self.parent_warehouse_map
+
+		# the host's shared snapshot of the tree resolves the map on its own arrays
+		snapshot = get_shared_snapshot()
+		if snapshot and snapshot.has_current_warehouse_tree():
+			self.parent_warehouse_map = snapshot.get_parent_warehouse_map()
+			return self.parent_warehouse_map
+
 		parent_warehouse_map = {}
 
-		all_warehouses = frappe.get_all(
+		# one read of the whole tree; children are resolved from lft/rgt in memory
+		# (same result as get_child_warehouses, which includes disabled children)
+		warehouse_tree = frappe.get_all(
 			"Warehouse",
-			fields=["name", "parent_warehouse", "is_group", "custom_include_in_mrp_report"],
-			filters={"disabled": 0}
+			fields=["name", "lft", "rgt", "is_group", "disabled", "custom_include_in_mrp_report"],
+			order_by="lft asc",
 		)
+		tree_lft = [wh.lft for wh in warehouse_tree]
+		all_warehouses = [wh for wh in warehouse_tree if not wh.disabled]
 
 		for wh in all_warehouses:
 
 			# ✅ Case 1: Group warehouses (FIXED aggregation)
 			if wh.is_group:
-				children = get_child_warehouses(wh.name)
+				children = [
+					child.name
+					for child in warehouse_tree[bisect_left(tree_lft, wh.lft) : bisect_right(tree_lft, wh.rgt)]
+					if child.rgt <= wh.rgt
+				]
 
 				# 🔥 FIX: include parent warehouse also
-				all_related = list(set(children + [wh.name]))
+				all_related = list({*children, wh.name})
 
 				parent_warehouse_map[wh.name] = all_related
 
@@ -868,6 +1491,7 @@ class ProductionPlanReport:
 			elif wh.custom_include_in_mrp_report:
 				parent_warehouse_map[wh.name] = [wh.name]
 
+		self.parent_warehouse_map = parent_warehouse_map
 		return parent_warehouse_map
 
 	# def get_parent_warehouses_with_children(self):
@@ -18,7 +18,34 @@ override_whitelisted_methods = {
 
 override_doctype_class = {
     "Work Order": "fiabila_customization.overrides.work_order.CustomWorkOrder",
-    "Stock Entry": "fiabila_customization.overrides.stock_entry.CustomStockEntry"
+    "Stock Entry": "fiabila_customization.overrides.stock_entry.CustomStockEntry",
+    "Pick List": "fiabila_customization.overrides.pick_list.CustomPickList"
+}
+
+after_install = "fiabila_customization.mrp.indexes.add_mrp_indexes"
+
+doc_events = {
+    "BOM": {
+        "on_submit": "fiabila_customization.mrp.bom_requirements.on_bom_change",
+        "on_cancel": "fiabila_customization.mrp.bom_requirements.on_bom_change",
+        "on_update_after_submit": "fiabila_customization.mrp.bom_requirements.on_bom_change",
+    },
+    "Warehouse": {
+        "after_insert": "fiabila_customization.mrp.shared_snapshot.on_warehouse_change",
+        "on_update": "fiabila_customization.mrp.shared_snapshot.on_warehouse_change",
+        "after_rename": "fiabila_customization.mrp.shared_snapshot.on_warehouse_change",
+        "on_trash": "fiabila_customization.mrp.shared_snapshot.on_warehouse_change",
+    },
+}
+
+scheduler_events = {
+    "daily": [
+        "fiabila_customization.mrp.bom_requirements.rebuild_bom_requirements",
+        "fiabila_customization.overrides.metrics.prune_metrics_logs"
+    ],
+    "weekly": [
+        "fiabila_customization.mrp.stock_checkpoints.create_stock_checkpoint"
+    ]
 }
 
 fixtures = [
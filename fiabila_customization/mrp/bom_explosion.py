@@ -0,0 +1,92 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Multi-level BOM explosion for the Material Requirement Planning report.
+
+get_bom_snapshot prefetches every BOM below the given ones with one query pair per
+BOM level; explode_bom_rows then walks that snapshot without touching the database,
+so it can run in the report process or in a worker process alike.
+"""
+
+import frappe
+
+
+def get_bom_snapshot(bom_nos):
+	"""
+	Returns {bom_no: (quantity, [(item_code, raw_material_name, qty, bom_no), ...])}
+	for bom_nos and every sub-assembly BOM reachable from them.
+	"""
+	snapshot = {}
+	pending = {bom_no for bom_no in bom_nos if bom_no}
+
+	while pending:
+		quantities = {
+			d.name: d.quantity
+			for d in frappe.get_all(
+				"BOM", fields=["name", "quantity"], filters={"name": ("in", list(pending))}
+			)
+		}
+		children = {bom_no: [] for bom_no in pending}
+
+		for d in frappe.get_all(
+			"BOM Item",
+			fields=[
+				"parent",
+				"item_code",
+				"item_name as raw_material_name",
+				"qty as required_qty_per_unit",
+				"bom_no",
+			],
+			filters={"parent": ("in", list(pending)), "docstatus": 1},
+			order_by="parent asc, idx asc",
+		):
+			children[d.parent].append((d.item_code, d.raw_material_name, d.required_qty_per_unit, d.bom_no))
+
+		for bom_no in pending:
+			snapshot[bom_no] = (quantities.get(bom_no) or 1, children[bom_no])
+
+		pending = {child[3] for bom_no in pending for child in children[bom_no] if child[3]} - snapshot.keys()
+
+	return snapshot
+
+
+def explode_bom_rows(top_level_rows, snapshot):
+	"""
+	Expand top-level BOM rows (dicts with parent, item_code, raw_material_name,
+	required_qty_per_unit and optionally bom_no) into {parent: [rows]}, each row
+	followed by the rows of its sub-assembly BOM with cumulative per-unit qty.
+	"""
+	raw_materials = {}
+
+	for d in top_level_rows:
+		rows = raw_materials.setdefault(d["parent"], [])
+		rows.append(d)
+
+		if d.get("bom_no"):
+			explode_bom(d["parent"], d["bom_no"], d["required_qty_per_unit"], snapshot, rows)
+
+	return raw_materials
+
+
+def explode_bom(parent_bom, bom_no, parent_multiplier, snapshot, rows):
+	"""Append the rows of bom_no (recursively) to rows, scaled by parent_multiplier."""
+	bom_quantity, children = snapshot.get(bom_no, (1, []))
+
+	for item_code, raw_material_name, qty, child_bom in children:
+		if not item_code:
+			continue
+
+		cumulative_multiplier = parent_multiplier * (qty / bom_quantity)
+		rows.append(
+			{
+				"parent": parent_bom,
+				"item_code": item_code,
+				"raw_material_name": raw_material_name,
+				"required_qty_per_unit": cumulative_multiplier,
+				"bom_no": child_bom,
+			}
+		)
+
+		if child_bom:
+			explode_bom(parent_bom, child_bom, cumulative_multiplier, snapshot, rows)
@@ -0,0 +1,253 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Pre-exploded BOM requirements.
+
+MRP BOM Requirement holds, for every active default BOM, the rows the report's
+multi-level explosion would produce (top-level items followed by their
+sub-assembly items, with cumulative per-unit qty). Rows carry the version of the
+BOM tree they were built from, the latest modified timestamp of the top BOM and
+of every sub-assembly BOM below it; the report only uses rows whose version
+still matches the tree and explodes everything else live. A BOM that explodes to
+nothing gets one marker row without item_code, so it is not rebuilt every night.
+
+Kept current by a daily scheduler job and by BOM submit / cancel / update after
+submit, which also refresh every BOM using the changed one as a sub-assembly.
+Both ask for a new shared snapshot (fiabila_customization.mrp.shared_snapshot).
+"""
+
+import frappe
+from frappe.utils import now
+
+from fiabila_customization.mrp.bom_explosion import explode_bom_rows, get_bom_snapshot
+from fiabila_customization.mrp.shared_snapshot import get_shared_snapshot, request_snapshot_rebuild
+
+DOCTYPE = "MRP BOM Requirement"
+REFRESH_BATCH_SIZE = 200
+
+
+def rebuild_bom_requirements():
+	"""Scheduled: refresh every active default BOM whose stored version is outdated."""
+	active = frappe.get_all("BOM", filters={"docstatus": 1, "is_active": 1, "is_default": 1}, pluck="name")
+
+	trees, stored = {}, {}
+	for top_bom, bom_no, bom_modified in frappe.db.sql(
+		f"SELECT DISTINCT top_bom, bom_no, bom_modified FROM `tab{DOCTYPE}`"
+	):
+		trees.setdefault(top_bom, []).append(bom_no)
+		stored[top_bom] = bom_modified
+
+	obsolete = list(set(stored) - set(active))
+	if obsolete:
+		frappe.db.delete(DOCTYPE, {"top_bom": ("in", obsolete)})
+
+	versions = get_tree_versions({bom_no: trees.get(bom_no, []) for bom_no in active})
+	stale = [
+		bom_no
+		for bom_no in active
+		if bom_no not in stored or not is_current(stored[bom_no], versions.get(bom_no))
+	]
+	for i in range(0, len(stale), REFRESH_BATCH_SIZE):
+		refresh_bom_requirements(stale[i : i + REFRESH_BATCH_SIZE])
+		frappe.db.commit()
+
+	if obsolete or stale:
+		request_snapshot_rebuild()
+
+
+def on_bom_change(doc, method=None):
+	"""doc_events hook for BOM on_submit / on_cancel / on_update_after_submit."""
+	frappe.enqueue(
+		"fiabila_customization.mrp.bom_requirements.update_for_bom",
+		queue="short",
+		bom_no=doc.name,
+		enqueue_after_commit=True,
+	)
+
+
+def update_for_bom(bom_no):
+	"""Refresh bom_no and every BOM above it; drop rows of the ones no longer active and default."""
+	affected = get_parent_boms(bom_no) | {bom_no}
+	active = frappe.get_all(
+		"BOM",
+		filters={"name": ("in", list(affected)), "docstatus": 1, "is_active": 1, "is_default": 1},
+		pluck="name",
+	)
+
+	inactive = list(affected - set(active))
+	if inactive:
+		frappe.db.delete(DOCTYPE, {"top_bom": ("in", inactive)})
+
+	refresh_bom_requirements(active)
+	request_snapshot_rebuild()
+
+
+def get_parent_boms(bom_no):
+	"""Every submitted BOM that uses bom_no as a sub-assembly, at any level."""
+	parents = set()
+	level = {bom_no}
+
+	while level:
+		level = (
+			set(
+				frappe.get_all(
+					"BOM Item",
+					filters={"bom_no": ("in", list(level)), "docstatus": 1},
+					pluck="parent",
+					distinct=True,
+				)
+			)
+			- parents
+		)
+		parents |= level
+
+	return parents
+
+
+def get_tree_versions(trees):
+	"""
+	{top_bom: version} for trees ({top_bom: [sub-assembly BOMs]}): the latest modified
+	timestamp of the top BOM and its sub-assembly BOMs. BOMs no longer submitted are left out.
+	"""
+	names = set(trees) | {bom_no for sub_boms in trees.values() for bom_no in sub_boms if bom_no}
+	if not names:
+		return {}
+
+	boms = {
+		d.name: d
+		for d in frappe.get_all(
+			"BOM", fields=["name", "modified", "docstatus"], filters={"name": ("in", list(names))}
+		)
+	}
+
+	versions = {}
+	for top_bom, sub_boms in trees.items():
+		if top_bom in boms and boms[top_bom].docstatus == 1:
+			versions[top_bom] = max(
+				boms[bom_no].modified for bom_no in {top_bom, *sub_boms} if bom_no in boms
+			)
+
+	return versions
+
+
+def is_current(stored_version, version):
+	# the shared snapshot keeps versions as strings
+	return version is not None and str(stored_version) == str(version)
+
+
+def refresh_bom_requirements(bom_nos):
+	"""Replace the stored rows of bom_nos with a fresh explosion."""
+	bom_nos = list(bom_nos)
+	if not bom_nos:
+		return
+
+	snapshot = get_bom_snapshot(bom_nos)
+	exploded = {}
+	for bom_no in bom_nos:
+		bom_quantity, children = snapshot[bom_no]
+		top_level_rows = [
+			{
+				"parent": bom_no,
+				"item_code": item_code,
+				"raw_material_name": raw_material_name,
+				"required_qty_per_unit": qty / bom_quantity,
+				"bom_no": sub_bom,
+			}
+			for item_code, raw_material_name, qty, sub_bom in children
+		]
+		exploded[bom_no] = explode_bom_rows(top_level_rows, snapshot).get(bom_no, [])
+
+	versions = get_tree_versions(
+		{bom_no: [row["bom_no"] for row in rows] for bom_no, rows in exploded.items()}
+	)
+	timestamp = now()
+	values = []
+
+	for bom_no, rows in exploded.items():
+		# marker row: an explosion with no rows is still up to date
+		rows = rows or [
+			{"item_code": None, "raw_material_name": None, "required_qty_per_unit": 0, "bom_no": None}
+		]
+
+		for sequence, row in enumerate(rows, 1):
+			values.append(
+				(
+					frappe.generate_hash(length=12),
+					timestamp,
+					timestamp,
+					"Administrator",
+					"Administrator",
+					bom_no,
+					sequence,
+					row["item_code"],
+					row["raw_material_name"],
+					row["required_qty_per_unit"],
+					row["bom_no"],
+					versions.get(bom_no),
+				)
+			)
+
+	frappe.db.delete(DOCTYPE, {"top_bom": ("in", bom_nos)})
+	frappe.db.bulk_insert(
+		DOCTYPE,
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"top_bom",
+			"sequence",
+			"item_code",
+			"raw_material_name",
+			"required_qty_per_unit",
+			"bom_no",
+			"bom_modified",
+		],
+		values,
+	)
+
+
+def get_bom_requirements(bom_nos):
+	"""
+	{top_bom: [rows]} for the BOMs among bom_nos with an up-to-date flattened
+	explosion. BOMs missing from the result must be exploded live.
+	"""
+	bom_nos = list(set(bom_nos))
+	if not bom_nos:
+		return {}
+
+	# with the shared snapshot only the BOM versions are read from the database
+	snapshot = get_shared_snapshot()
+	stored = snapshot.get_bom_requirements(bom_nos) if snapshot else get_stored_requirements(bom_nos)
+
+	versions = get_tree_versions(
+		{top_bom: [row.bom_no for row in rows] for top_bom, (_version, rows) in stored.items()}
+	)
+
+	return {
+		top_bom: [row for row in rows if row.item_code]
+		for top_bom, (version, rows) in stored.items()
+		if is_current(version, versions.get(top_bom))
+	}
+
+
+def get_stored_requirements(bom_nos):
+	"""{top_bom: (version, [rows])} as stored for bom_nos, in one indexed lookup."""
+	stored = {}
+	for d in frappe.db.sql(
+		f"""
+		SELECT top_bom as parent, item_code, raw_material_name,
+			required_qty_per_unit, bom_no, bom_modified
+		FROM `tab{DOCTYPE}`
+		WHERE top_bom IN %(bom_nos)s
+		ORDER BY top_bom, sequence
+		""",
+		{"bom_nos": bom_nos},
+		as_dict=True,
+	):
+		version = d.pop("bom_modified")
+		stored.setdefault(d.parent, (version, []))[1].append(d)
+
+	return stored
@@ -0,0 +1,137 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Consolidated Material Requirement Planning run over several companies.
+
+With the consolidated_companies filter, the report loads the open orders of all
+listed companies in one query and explodes each distinct BOM once. It then fetches
+Bin, warehouse stock and Purchase Order data once for all their items and
+warehouses. Each company is netted on its own view of these inputs: its
+orders, copies of their raw material rows, its Item Defaults, and its Bins
+limited to the warehouses a run for that company alone would read. Each company's
+rows are therefore the same as running the report once per company, and come
+out one company after the other with a Company column. Time-phased runs read
+the Purchase Order supply once for all companies' raw materials as well.
+"""
+
+import copy
+
+import frappe
+from frappe import _
+
+from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+	ProductionPlanReport,
+)
+
+COMPANY_COLUMN = {
+	"label": _("Company"),
+	"fieldname": "company",
+	"fieldtype": "Link",
+	"options": "Company",
+	"width": 120,
+}
+
+
+def get_companies(filters):
+	companies = filters.get("consolidated_companies") or []
+	if isinstance(companies, str):
+		companies = frappe.parse_json(companies) if companies.startswith("[") else companies.split(",")
+
+	return list(dict.fromkeys(company.strip() for company in companies if company and company.strip()))
+
+
+class ConsolidatedPlanReport(ProductionPlanReport):
+	def __init__(self, filters=None):
+		super().__init__(filters)
+		self.companies = get_companies(self.filters)
+		self.company_item_details = {}
+		self.company_reports = []
+
+	def get_item_details(self, item_codes=None):
+		"""
+		Item Defaults of every company, kept apart: default warehouses are per company.
+		With item_codes, re-read just those.
+		"""
+		if not (self.orders and self.item_codes):
+			return
+
+		if item_codes is None:
+			item_codes = self.item_codes
+			self.item_details = {}
+			self.company_item_details = {}
+		else:
+			for details in self.company_item_details.values():
+				for item_code in item_codes:
+					details.pop(item_code, None)
+
+		for d in frappe.get_all(
+			"Item Default",
+			fields=["parent", "default_warehouse", "company"],
+			filters={"company": ("in", self.companies), "parent": ("in", item_codes)},
+		):
+			self.company_item_details.setdefault(d.company, {})[d.parent] = d
+
+	def build_data(self):
+		self.data = []
+		self.pegging = {}
+		self.company_reports = [self.get_company_report(company) for company in self.companies]
+
+		if self.filters.time_phased:
+			# Purchase Order supply of every company's raw materials in one query
+			supply = self.get_time_phased_supply(
+				list({row.item_code for rows in self.raw_materials_dict.values() for row in rows})
+			)
+			for report in self.company_reports:
+				report.time_phased_supply = supply
+
+		for report in self.company_reports:
+			report.build_data()
+			for row in report.data:
+				row["company"] = report.filters.company
+				self.data.append(row)
+
+			for item_code, rows in report.pegging.items():
+				self.pegging.setdefault(item_code, []).extend(rows)
+
+		self.get_columns()
+		return self.columns, self.data
+
+	def get_company_report(self, company):
+		"""A ProductionPlanReport for company alone, on the shared inputs loaded by this run."""
+		report = ProductionPlanReport({**self.filters, "company": company, "consolidated_companies": None})
+		report.orders = [d for d in self.orders or [] if d.company == company]
+		report.parent_warehouse_map = self.get_parent_warehouses_with_children()
+		report.item_details = self.company_item_details.get(company, {})
+		report.mrp_warehouses = list(getattr(self, "mrp_warehouses", None) or [])
+		report.purchase_details = getattr(self, "purchase_details", None) or {}
+
+		keys = {d.name if self.filters.based_on == "Work Order" else d.bom_no for d in report.orders}
+		# netting writes into the raw material rows and bins, so each company gets its own
+		report.raw_materials_dict = copy.deepcopy(
+			{key: rows for key, rows in self.raw_materials_dict.items() if key in keys}
+		)
+
+		report.item_codes = [d.production_item for d in report.orders if d.production_item]
+		report.item_codes.extend(row.item_code for rows in report.raw_materials_dict.values() for row in rows)
+		report.warehouses = [d.warehouse for d in report.orders if d.warehouse] + report.mrp_warehouses
+
+		item_codes, warehouses = set(report.item_codes), set(report.warehouses)
+		report.bin_details = {
+			key: frappe._dict(d)
+			for key, d in (getattr(self, "bin_details", None) or {}).items()
+			if key[0] in item_codes and key[1] in warehouses
+		}
+
+		return report
+
+	def get_columns(self):
+		if self.filters.time_phased:
+			columns = max((report.columns for report in self.company_reports), key=len, default=[])
+		else:
+			# stock columns dropped by sparse_stock_columns can differ between companies
+			super().get_columns()
+			used = {column["fieldname"] for report in self.company_reports for column in report.columns}
+			columns = [column for column in self.columns if column["fieldname"] in used]
+
+		self.columns = [COMPANY_COLUMN, *columns]
@@ -0,0 +1,270 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Delta refresh of an open Material Requirement Planning report.
+
+Once get_report_delta has been called for a set of filters, their runs keep a
+version (run_cache.set_run_version) of the inputs their rows were netted from; the
+first call answers {"full": true}. get_report_delta takes the version on screen and
+
+1. finds what changed since that run started reading (less DELTA_OVERLAP, for
+   transactions committed late): open orders added, removed or modified, and
+   items with Stock Ledger, Bin, Purchase Order or Item changes;
+2. re-reads raw materials for just those orders, and stock, Bin, PO and Item
+   Default data for just those items, into the stored inputs;
+3. nets the patched inputs again in memory and returns, against the old rows,
+   the rows that were added, changed or removed, under a new version.
+
+Rows are matched by (order, raw material, warehouse, occurrence). Time-phased
+runs, BOM, warehouse tree or column changes and expired versions answer
+{"full": true}: the browser reruns the report.
+"""
+
+import datetime
+import pickle
+from collections import Counter
+
+import frappe
+from frappe.utils import now_datetime
+
+from fiabila_customization.mrp.run_cache import (
+	get_filters_key,
+	get_run_filters_key,
+	get_run_result,
+	get_run_token,
+	get_run_version,
+	mark_delta_used,
+	new_run_token,
+	normalize_filters,
+	set_user_run,
+)
+
+DELTA_OVERLAP = datetime.timedelta(minutes=5)
+
+
+@frappe.whitelist()
+def get_report_delta(filters, version=None):
+	"""Rows changed since version (default: the run of these filters last served to the user)."""
+	from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+		ProductionPlanReport,
+		check_report_permission,
+		save_run,
+	)
+
+	check_report_permission()
+
+	filters = normalize_filters(filters)
+	filters_key = get_filters_key(filters)
+	run_token = get_run_token(filters)
+	mark_delta_used(filters_key)
+
+	if not version and run_token:
+		version = (get_run_result(run_token) or {}).get("version")
+	state = get_run_version(version) if version else None
+	if not state or get_run_filters_key(state["run_token"]) != filters_key:
+		return {"full": True}
+
+	# the rows are stored once, with the result of the run the version belongs to
+	previous = get_run_result(state["run_token"])
+	if not previous:
+		return {"full": True}
+
+	started = now_datetime()
+	report = ProductionPlanReport(filters)
+	report.set_inputs(pickle.loads(state["inputs"]))
+
+	touched = refresh_inputs(report, state["started"] - DELTA_OVERLAP)
+	if touched is None:
+		return {"full": True}
+
+	report.input_snapshot = pickle.dumps(report.get_inputs())
+	report.build_data()
+	if report.columns != previous["columns"]:
+		return {"full": True}
+
+	run_token = new_run_token(filters_key)
+	version = save_run(run_token, report, started)
+	set_user_run(run_token)
+
+	return {
+		"full": False,
+		"version": version,
+		"touched_items": len(touched),
+		**diff_rows(previous["data"], report.data),
+	}
+
+
+def refresh_inputs(report, since):
+	"""Patch the loaded inputs of report with what changed since; the touched items, or None to start over."""
+	if not (report.orders and report.raw_materials_dict):
+		return None
+
+	# the stock columns follow the warehouse tree
+	if frappe.get_all("Warehouse", filters={"modified": (">", since)}, limit=1):
+		return None
+
+	# a changed BOM can sit anywhere below the orders' BOMs, sub-assemblies included
+	if report.filters.based_on != "Work Order" and frappe.get_all(
+		"BOM", filters={"modified": (">", since)}, limit=1
+	):
+		return None
+
+	warehouses = set(report.warehouses)
+	touched = refresh_orders(report, since)
+	if not set(report.warehouses) <= warehouses:
+		# Bins are read for the report's warehouses, a new one can add stock to every item
+		touched.update(report.item_codes)
+	else:
+		touched.update(get_changed_items(since) & set(report.item_codes))
+
+	report.reload_items(list(touched))
+	return touched
+
+
+def refresh_orders(report, since):
+	"""Swap in the current open orders and explode the new and changed ones; returns their items."""
+	from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+		ProductionPlanReport,
+	)
+
+	by_work_order = report.filters.based_on == "Work Order"
+
+	current = ProductionPlanReport(report.filters)
+	current.get_open_orders()
+	orders = current.orders or []
+
+	# rows without a BOM were given the item's default BOM when loaded
+	default_boms = {(d.name, d.production_item): d.bom_no for d in report.orders}
+	without_bom = set()
+	if not by_work_order:
+		for i, d in enumerate(orders):
+			if not d.bom_no:
+				without_bom.add(i)
+				d.bom_no = default_boms.get((d.name, d.production_item))
+
+	previous, latest = (
+		Counter(map(get_order_signature, report.orders)),
+		Counter(map(get_order_signature, orders)),
+	)
+	changed = {dict(signature)["name"] for signature in (previous - latest) + (latest - previous)}
+	changed.update(frappe.get_all(report.filters.based_on, filters={"modified": (">", since)}, pluck="name"))
+
+	def get_key(d):
+		return d.name if by_work_order else d.bom_no
+
+	touched = set()
+	for d in report.orders:
+		if d.name in changed:
+			touched.add(d.production_item)
+			touched.update(row.item_code for row in report.raw_materials_dict.get(get_key(d)) or [])
+			if by_work_order:
+				report.raw_materials_dict.pop(d.name, None)
+
+	to_explode = []
+	for i, d in enumerate(orders):
+		if d.name not in changed:
+			continue
+
+		touched.add(d.production_item)
+		if i in without_bom:
+			d.bom_no = None
+		if not d.bom_no or get_key(d) not in report.raw_materials_dict:
+			to_explode.append(d)
+
+	if to_explode:
+		explosion = ProductionPlanReport(report.filters)
+		explosion.orders = to_explode
+		explosion.parent_warehouse_map = report.get_parent_warehouses_with_children()
+		explosion.get_raw_materials()
+
+		report.raw_materials_dict.update(explosion.raw_materials_dict)
+		report.item_codes.extend(getattr(explosion, "item_codes", None) or [])
+		report.warehouses.extend(getattr(explosion, "warehouses", None) or [])
+
+	for d in orders:
+		if d.name in changed:
+			touched.update(row.item_code for row in report.raw_materials_dict.get(get_key(d)) or [])
+			if d.warehouse:
+				report.warehouses.append(d.warehouse)
+
+	report.orders = orders
+	return touched
+
+
+def get_order_signature(d):
+	return tuple(sorted(d.items()))
+
+
+def get_changed_items(since):
+	"""Items with Stock Ledger, Bin, Purchase Order or Item (defaults) changes since."""
+	items = set(
+		frappe.get_all(
+			"Stock Ledger Entry", filters={"modified": (">", since)}, pluck="item_code", distinct=True
+		)
+	)
+	items.update(frappe.get_all("Bin", filters={"modified": (">", since)}, pluck="item_code"))
+	items.update(
+		frappe.get_all(
+			"Purchase Order Item", filters={"modified": (">", since)}, pluck="item_code", distinct=True
+		)
+	)
+
+	# status changes (receipts, closing) are made on the Purchase Order itself
+	purchase_orders = frappe.get_all("Purchase Order", filters={"modified": (">", since)}, pluck="name")
+	if purchase_orders:
+		items.update(
+			frappe.get_all(
+				"Purchase Order Item",
+				filters={"parent": ("in", purchase_orders)},
+				pluck="item_code",
+				distinct=True,
+			)
+		)
+
+	items.update(frappe.get_all("Item", filters={"modified": (">", since)}, pluck="name"))
+	return items
+
+
+def get_row_keys(rows):
+	"""(order, raw material, warehouse, occurrence) per row; only an order's first row carries its name."""
+	keys, seen, order = [], Counter(), None
+	for row in rows:
+		order = row.get("name") or order
+		key = (order, row.get("item_code"), row.get("warehouse"))
+		seen[key] += 1
+		keys.append((*key, seen[key]))
+
+	return keys
+
+
+def diff_rows(old_rows, new_rows):
+	"""
+	new_rows as a patch of old_rows: "rows" has, per new row, the index of the equal old
+	row or the row itself. "in_place" is set when no row was added, removed or moved.
+	"""
+	old_index = {key: i for i, key in enumerate(get_row_keys(old_rows))}
+	rows, added, changed = [], 0, 0
+	in_place = len(old_rows) == len(new_rows)
+
+	for j, (key, row) in enumerate(zip(get_row_keys(new_rows), new_rows, strict=True)):
+		i = old_index.pop(key, None)
+		if i is None:
+			added += 1
+			in_place = False
+			rows.append(row)
+		elif old_rows[i] == row:
+			in_place = in_place and i == j
+			rows.append(i)
+		else:
+			changed += 1
+			in_place = in_place and i == j
+			rows.append(row)
+
+	return {
+		"rows": rows,
+		"added": added,
+		"changed": changed,
+		"removed": len(old_index),
+		"in_place": in_place and not old_index,
+	}
@@ -0,0 +1,199 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Streaming export of the Material Requirement Planning report.
+
+export_report queues the export as a background job. The job takes the rows from
+ProductionPlanReport.iter_report_rows and writes them to a private file in
+fixed-size batches, so memory stays bounded by the batch size rather than by the
+number of rows in the result. When the file is written its URL is published to
+the user (EXPORT_READY_EVENT).
+
+Time-phased results have one row per raw material, and consolidated runs
+(consolidated_companies) net each company on its own; both are computed in full,
+then written in batches the same way.
+"""
+
+import csv
+import hashlib
+import json
+from itertools import islice
+
+import frappe
+from frappe import _
+
+EXPORT_BATCH_SIZE = 5000
+EXPORT_JOB_TIMEOUT = 60 * 60
+EXPORT_READY_EVENT = "mrp_export_ready"
+NUMERIC_FIELDTYPES = ("Float", "Currency", "Int", "Percent")
+
+
+@frappe.whitelist()
+def export_report(filters, file_format="CSV"):
+	"""Queue the export of the report; returns the export id the ready event will carry."""
+	from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+		check_report_permission,
+	)
+
+	check_report_permission()
+
+	if isinstance(filters, str):
+		filters = json.loads(filters)
+
+	if file_format not in ("CSV", "Parquet"):
+		frappe.throw(_("Unsupported export format {0}").format(file_format))
+
+	export_id = frappe.generate_hash(length=10)
+	frappe.enqueue(
+		"fiabila_customization.mrp.export.write_export",
+		queue="long",
+		timeout=EXPORT_JOB_TIMEOUT,
+		filters=filters,
+		file_format=file_format,
+		export_id=export_id,
+		user=frappe.session.user,
+	)
+
+	return {"export_id": export_id}
+
+
+def write_export(filters, file_format, export_id, user=None):
+	"""Background job: write the report to a private file and publish its URL to user."""
+	try:
+		report, rows = get_export_rows(filters)
+		# the generator fills report.columns before yielding its first row
+		first_batch = list(islice(rows, EXPORT_BATCH_SIZE))
+		columns = report.columns
+
+		extension = "csv" if file_format == "CSV" else "parquet"
+		file_name = f"material-requirement-planning-{export_id}.{extension}"
+		file_path = frappe.get_site_path("private", "files", file_name)
+
+		batches = _iter_batches(first_batch, rows)
+		if file_format == "CSV":
+			row_count = write_csv(file_path, columns, batches)
+		else:
+			row_count = write_parquet(file_path, columns, batches)
+
+		file_doc = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": file_name,
+				"file_url": f"/private/files/{file_name}",
+				"is_private": 1,
+				"content_hash": _get_file_hash(file_path),
+			}
+		)
+		file_doc.insert(ignore_permissions=True)
+		frappe.db.commit()
+
+		status = {"export_id": export_id, "file_url": file_doc.file_url, "row_count": row_count}
+
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title=_("Material Requirement Planning export failed"))
+		status = {"export_id": export_id, "error": _("The export failed, please retry.")}
+
+	frappe.publish_realtime(EXPORT_READY_EVENT, status, user=user)
+
+
+def get_export_rows(filters):
+	"""The report and an iterator over its rows, as execute_report would return them."""
+	from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+		ProductionPlanReport,
+	)
+
+	report = ProductionPlanReport(filters)
+	if report.filters.consolidated_companies:
+		from fiabila_customization.mrp.consolidated import ConsolidatedPlanReport
+
+		report = ConsolidatedPlanReport(filters)
+		report.execute_report()
+		return report, iter(report.data)
+
+	if report.filters.time_phased:
+		report.execute_report()
+		return report, iter(report.data)
+
+	return report, report.iter_report_rows()
+
+
+def write_csv(file_path, columns, batches):
+	fieldnames = [c["fieldname"] for c in columns]
+	row_count = 0
+
+	with open(file_path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow([c.get("label") or c["fieldname"] for c in columns])
+
+		for batch in batches:
+			writer.writerows([_format_value(row.get(field)) for field in fieldnames] for row in batch)
+			row_count += len(batch)
+
+	return row_count
+
+
+def write_parquet(file_path, columns, batches):
+	try:
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+	except ImportError:
+		frappe.throw(_("Parquet export needs the pyarrow package to be installed"))
+
+	schema = pa.schema(
+		[
+			(c["fieldname"], pa.float64() if c.get("fieldtype") in NUMERIC_FIELDTYPES else pa.string())
+			for c in columns
+		]
+	)
+	numeric = {c["fieldname"] for c in columns if c.get("fieldtype") in NUMERIC_FIELDTYPES}
+	row_count = 0
+
+	with pq.ParquetWriter(file_path, schema) as writer:
+		for batch in batches:
+			table = pa.Table.from_pydict(
+				{
+					field.name: [
+						_to_float(row.get(field.name))
+						if field.name in numeric
+						else _to_str(row.get(field.name))
+						for row in batch
+					]
+					for field in schema
+				},
+				schema=schema,
+			)
+			writer.write_table(table)
+			row_count += len(batch)
+
+	return row_count
+
+
+def _iter_batches(first_batch, rows):
+	batch = first_batch
+	while batch:
+		yield batch
+		batch = list(islice(rows, EXPORT_BATCH_SIZE))
+
+
+def _format_value(value):
+	return "" if value is None else value
+
+
+def _to_float(value):
+	if value in (None, ""):
+		return None
+	return float(value)
+
+
+def _to_str(value):
+	return None if value is None else str(value)
+
+
+def _get_file_hash(file_path):
+	md5 = hashlib.md5()
+	with open(file_path, "rb") as f:
+		for chunk in iter(lambda: f.read(1 << 20), b""):
+			md5.update(chunk)
+	return md5.hexdigest()
@@ -0,0 +1,49 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Composite indexes for the MRP report and override queries that stock ERPNext
+does not cover. Applied by the add_mrp_indexes patch; tests/test_explain.py verifies
+that the report's queries actually use an index.
+"""
+
+import frappe
+
+MRP_INDEXES = (
+	# get_purchase_details: item_code IN (...) AND docstatus = 1 AND received_qty = 0
+	("Purchase Order Item", ("item_code", "docstatus", "received_qty")),
+	# build_material_request_groups: open Material Request Items of the proposed items
+	("Material Request Item", ("item_code", "parent")),
+	# get_bin_details / get_warehouse_item_stock: item_code IN (...) AND warehouse IN (...)
+	# (ERPNext v14+ already has the unique_item_warehouse key, in which case this is a no-op)
+	("Bin", ("item_code", "warehouse")),
+	# bom_requirements.get_parent_boms: BOMs using a sub-assembly BOM
+	("BOM Item", ("bom_no", "docstatus")),
+	# bom_requirements.get_bom_requirements: rows of a top BOM in sequence
+	("MRP BOM Requirement", ("top_bom", "sequence")),
+	# stock_checkpoints.get_checkpoint_stock: one checkpoint date for the run's items
+	("MRP Stock Checkpoint", ("checkpoint_date", "item_code", "warehouse")),
+	# stock_checkpoints.get_changes_since: ledger entries inserted or cancelled after a checkpoint
+	("Stock Ledger Entry", ("modified",)),
+)
+
+
+def add_mrp_indexes():
+	for doctype, columns in MRP_INDEXES:
+		if not has_index(doctype, columns):
+			frappe.db.add_index(doctype, list(columns), index_name=get_index_name(columns))
+
+
+def get_index_name(columns):
+	return "mrp_" + "_".join(columns)
+
+
+def has_index(doctype, columns):
+	"""True if an existing index of doctype starts with columns, in that order."""
+	indexes = {}
+	for d in frappe.db.sql(f"SHOW INDEX FROM `tab{doctype}`", as_dict=True):
+		indexes.setdefault(d.Key_name, {})[d.Seq_in_index] = d.Column_name
+
+	return any(
+		tuple(index[i] for i in sorted(index))[: len(columns)] == tuple(columns) for index in indexes.values()
+	)
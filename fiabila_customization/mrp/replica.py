@@ -0,0 +1,214 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Read-replica routing for the Material Requirement Planning report.
+
+With site config mrp_replica set, the read-only stages of a run
+(ProductionPlanReport.execute_report: open orders, BOM items, Bin, Purchase Order
+Item, Warehouse) run on a second database connection; the result cache and
+Material Request creation stay on the primary.
+
+	"mrp_replica": {"host": "10.0.0.12", "port": 3306, "db_name": "...", "db_user": "...", "db_password": "...", "max_lag": 30}
+
+Missing keys default to the site's own database settings, so a second local
+database only needs {"db_name": "<copy of the site database>"}.
+
+Before each run the replica's lag is checked: Seconds_Behind_Master when it is a
+replication slave, otherwise how long ago the oldest change it is missing was
+made on the primary, for the doctypes in LAG_CHECK_DOCTYPES. The result is shared
+by all runs of the site for LAG_CACHE_SECONDS, and each worker thread keeps its
+replica connection open between runs. A replica that is unreachable, has stopped
+replicating, lags more than max_lag seconds or fails during the run is skipped
+and the run is done on the primary.
+"""
+
+import contextlib
+import threading
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+DEFAULT_MAX_LAG = 30
+LAG_CHECK_DOCTYPES = ("Stock Ledger Entry", "Bin", "Work Order", "Sales Order", "Purchase Order")
+LAG_CACHE_SECONDS = 5
+LAG_CACHE_KEY = "mrp_replica_lag"
+
+# connections.by_site: {site: (settings, replica)} of this thread
+_connections = threading.local()
+
+
+def get_replica_settings():
+	settings = frappe.conf.get("mrp_replica")
+	if not settings:
+		return None
+
+	return frappe._dict(
+		host=settings.get("host"),
+		port=settings.get("port"),
+		db_name=settings.get("db_name") or frappe.conf.db_name,
+		db_user=settings.get("db_user") or frappe.conf.db_user or frappe.conf.db_name,
+		db_password=settings.get("db_password") or frappe.conf.db_password,
+		max_lag=cint(settings.get("max_lag") or DEFAULT_MAX_LAG),
+	)
+
+
+def connect_replica(settings):
+	from frappe.database import get_db
+
+	replica = get_db(
+		host=settings.host,
+		port=settings.port,
+		user=settings.db_user,
+		password=settings.db_password,
+		cur_db_name=settings.db_name,
+	)
+	replica.connect()
+	return replica
+
+
+def get_replica_connection(settings):
+	"""This thread's open connection to the replica, reconnecting when it dropped or settings changed."""
+	connections = _connections.__dict__.setdefault("by_site", {})
+	cached = connections.get(frappe.local.site)
+	if cached and cached[0] == settings:
+		try:
+			cached[1].sql("SELECT 1")
+			return cached[1]
+		except Exception:
+			pass
+
+	discard_replica_connection()
+	replica = connect_replica(settings)
+	connections[frappe.local.site] = (settings, replica)
+	return replica
+
+
+def discard_replica_connection():
+	_settings, replica = _connections.__dict__.get("by_site", {}).pop(frappe.local.site, (None, None))
+	if replica:
+		with contextlib.suppress(Exception):
+			replica.close()
+
+
+def release_replica_connection(replica):
+	"""End the read transaction so the next run sees current replica data."""
+	try:
+		replica.rollback()
+	except Exception:
+		discard_replica_connection()
+
+
+def open_replica():
+	"""A connection to the configured replica when it is reachable and within max_lag, else None."""
+	settings = get_replica_settings()
+	if not settings:
+		return None
+
+	try:
+		replica = get_replica_connection(settings)
+	except Exception:
+		frappe.logger("mrp_replica").warning("MRP replica unreachable, reading from primary", exc_info=True)
+		return None
+
+	lag = get_cached_replica_lag(replica)
+	if lag is None or lag > settings.max_lag:
+		frappe.logger("mrp_replica").info(
+			f"MRP replica lag {lag}s over {settings.max_lag}s, reading from primary"
+		)
+		release_replica_connection(replica)
+		return None
+
+	return replica
+
+
+def get_cached_replica_lag(replica):
+	"""get_replica_lag, checked at most once every LAG_CACHE_SECONDS per site."""
+	cached = frappe.cache().get_value(LAG_CACHE_KEY)
+	if cached is not None:
+		return cached["lag"]
+
+	try:
+		lag = get_replica_lag(replica)
+	except Exception:
+		frappe.logger("mrp_replica").warning(
+			"MRP replica lag check failed, reading from primary", exc_info=True
+		)
+		discard_replica_connection()
+		lag = None
+
+	frappe.cache().set_value(LAG_CACHE_KEY, {"lag": lag}, expires_in_sec=LAG_CACHE_SECONDS)
+	return lag
+
+
+def get_replica_lag(replica):
+	"""Seconds the replica is behind the primary, or None when it is not replicating."""
+	if frappe.conf.db_type != "postgres":
+		try:
+			status = replica.sql("SHOW SLAVE STATUS", as_dict=True)
+		except Exception:
+			# no replication monitoring privilege: fall back to comparing the data
+			status = None
+
+		if status:
+			return status[0].get("Seconds_Behind_Master")
+
+	return get_data_lag(replica)
+
+
+def get_data_lag(replica):
+	"""Age of the oldest change on the primary that the replica does not have yet (0 when up to date)."""
+	now = now_datetime()
+	lag = 0
+
+	for doctype in LAG_CHECK_DOCTYPES:
+		replica_latest = replica.sql(f"SELECT MAX(modified) FROM `tab{doctype}`")[0][0]
+		if replica_latest:
+			missing_since = frappe.db.sql(
+				f"SELECT MIN(modified) FROM `tab{doctype}` WHERE modified > %s", replica_latest
+			)[0][0]
+		else:
+			missing_since = frappe.db.sql(f"SELECT MIN(modified) FROM `tab{doctype}`")[0][0]
+
+		if missing_since:
+			lag = max(lag, (now - missing_since).total_seconds())
+
+	return lag
+
+
+@contextlib.contextmanager
+def use_connection(db):
+	"""Route frappe.db (and frappe.qb queries) to db for the duration."""
+	primary = frappe.local.db
+	frappe.local.db = db
+	try:
+		yield
+	finally:
+		frappe.local.db = primary
+
+
+def run_on_replica(func):
+	"""
+	func() with its queries on the replica when one is usable, else on the primary.
+	func must only read and must not keep state from an attempt that fails on the replica.
+	Nothing func registers to run after commit is ever run on the replica: queue such
+	work before calling.
+	"""
+	replica = open_replica()
+	if not replica:
+		return func()
+
+	try:
+		with use_connection(replica):
+			return func()
+	except frappe.ValidationError:
+		raise
+	except Exception:
+		frappe.logger("mrp_replica").warning(
+			"MRP run failed on the replica, retrying on primary", exc_info=True
+		)
+		discard_replica_connection()
+	finally:
+		release_replica_connection(replica)
+
+	return func()
@@ -0,0 +1,137 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Cached results of Material Requirement Planning runs.
+
+Every run gets its own token: the key of its normalized filters plus a nonce. The
+token of the run served to a user is kept per user and filters key, so the browser
+can refer to the result it is showing by sending the filters (or the token) instead
+of posting the rows back to the server, and a rerun of the same filters by someone
+else does not change what the user's follow-up actions work from.
+
+The rows are stored once, with the run's result. For filters someone refreshed
+by delta (fiabila_customization.mrp.delta) in the last DELTA_USE_TTL, the result
+also gets a version: the pre-netting inputs it was built from, under a random
+token, so the next delta refresh can patch the inputs instead of loading
+everything again. Inputs over MAX_INPUT_SNAPSHOT_SIZE are not kept.
+"""
+
+import hashlib
+import json
+import pickle
+
+import frappe
+
+RUN_RESULT_TTL = 60 * 60
+DELTA_USE_TTL = 24 * 60 * 60
+MAX_INPUT_SNAPSHOT_SIZE = 20 * 1024 * 1024
+
+
+def normalize_filters(filters):
+	"""Filters as a plain dict without empty values, so equivalent runs compare equal."""
+	if isinstance(filters, str):
+		filters = json.loads(filters)
+
+	return {key: value for key, value in sorted((filters or {}).items()) if value not in (None, "", [], 0)}
+
+
+def get_filters_key(filters):
+	payload = json.dumps(normalize_filters(filters), sort_keys=True, default=str)
+	return hashlib.sha1(payload.encode()).hexdigest()[:20]
+
+
+def new_run_token(filters_key):
+	return f"{filters_key}.{frappe.generate_hash(length=10)}"
+
+
+def get_run_filters_key(run_token):
+	return run_token.split(".", 1)[0]
+
+
+def set_user_run(run_token, user=None):
+	"""Record run_token as the run of its filters last served to user (default: session user)."""
+	frappe.cache().set_value(
+		f"mrp_user_run:{user or frappe.session.user}:{get_run_filters_key(run_token)}",
+		run_token,
+		expires_in_sec=RUN_RESULT_TTL,
+	)
+
+
+def get_run_token(filters, user=None):
+	"""Token of the run of filters last served to user (default: session user), or None."""
+	return frappe.cache().get_value(f"mrp_user_run:{user or frappe.session.user}:{get_filters_key(filters)}")
+
+
+def set_run_result(run_token, columns, data, **extra):
+	frappe.cache().set_value(
+		f"mrp_run_result:{run_token}",
+		{"columns": columns, "data": data, **extra},
+		expires_in_sec=RUN_RESULT_TTL,
+	)
+
+
+def get_run_result(run_token):
+	return frappe.cache().get_value(f"mrp_run_result:{run_token}")
+
+
+def set_run_pegging(run_token, pegging):
+	"""
+	Store the pegging index ({item_code: [(order, production item, qty)]}) of a run
+	as a redis hash, so one raw material is looked up without loading the rest.
+	"""
+	cache = frappe.cache()
+	key = cache.make_key(f"mrp_run_pegging:{run_token}")
+
+	pipeline = cache.pipeline()
+	pipeline.delete(key)
+	if pegging:
+		pipeline.hset(key, mapping={item_code: pickle.dumps(rows) for item_code, rows in pegging.items()})
+	# an empty marker keeps an empty run distinguishable from an expired one
+	pipeline.hset(key, "", pickle.dumps([]))
+	pipeline.expire(key, RUN_RESULT_TTL)
+	pipeline.execute()
+
+
+def get_run_pegging(run_token, item_code):
+	"""Pegging rows of item_code in the run, [] if it has none, None if the run expired."""
+	cache = frappe.cache()
+	key = cache.make_key(f"mrp_run_pegging:{run_token}")
+
+	rows, marker = cache.hmget(key, [item_code, ""])
+	if marker is None:
+		return None
+
+	return pickle.loads(rows) if rows else []
+
+
+def mark_delta_used(filters_key):
+	"""Keep input snapshots for runs of filters_key from now on (for DELTA_USE_TTL)."""
+	frappe.cache().set_value(f"mrp_delta_used:{filters_key}", 1, expires_in_sec=DELTA_USE_TTL)
+
+
+def is_delta_used(filters_key):
+	return bool(frappe.cache().get_value(f"mrp_delta_used:{filters_key}"))
+
+
+def set_run_version(run_token, started, inputs):
+	"""
+	Store a version of a run's result and return its token. started is when the
+	run began reading; inputs the pickled ProductionPlanReport.get_inputs(). None,
+	and nothing is stored, when there are no inputs or they are too large to keep:
+	the run cannot be refreshed by delta. The rows stay with the run's result.
+	"""
+	if not inputs or len(inputs) > MAX_INPUT_SNAPSHOT_SIZE:
+		return None
+
+	version = frappe.generate_hash(length=20)
+	frappe.cache().set_value(
+		f"mrp_run_version:{version}",
+		{"run_token": run_token, "started": started, "inputs": inputs},
+		expires_in_sec=RUN_RESULT_TTL,
+	)
+	return version
+
+
+def get_run_version(version):
+	return frappe.cache().get_value(f"mrp_run_version:{version}")
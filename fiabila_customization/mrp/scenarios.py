@@ -0,0 +1,300 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+What-if scenarios for the Material Requirement Planning report.
+
+The report's inputs (open orders, exploded raw materials, Bin stock) are loaded
+once into a ScenarioPlan of read-only arrays: one entry per demand line (order,
+item, qty, candidate bins in pick order) and one per Bin. As in the report, each
+order first takes its own finished good from the Bin of its warehouse, then its
+raw materials. Each scenario nets the demand lines against its own copy of the
+Bin quantities, with the listed orders moved to the front and the excluded
+warehouses emptied, so an extra scenario costs one pass over the demand lines
+and no queries.
+
+The Current balance is the report's own balance_qty, from netting the same
+inputs through ProductionPlanReport.build_data. A scenario's balance is that
+balance moved by the change of its shortage against Current.
+"""
+
+import json
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import flt
+
+SHORTAGE_TOLERANCE = 1e-9
+
+
+class ScenarioPlan:
+	def __init__(self, report):
+		"""Snapshot the prepared inputs of report (a ProductionPlanReport after its data stages)."""
+		self.order_names = []
+		self.order_items = []
+		self.item_codes = []
+		self.raw_material_names = {}
+		self.po_qty = {}
+
+		item_index = {}
+		bin_index = {}
+		bin_warehouses, bin_qty = [], []
+
+		for (item_code, warehouse), d in (getattr(report, "bin_details", None) or {}).items():
+			bin_index[(item_code, warehouse)] = len(bin_qty)
+			bin_warehouses.append(warehouse)
+			bin_qty.append(d.actual_qty or 0)
+
+		line_order, line_item, line_qty, line_bins, line_finished_good = [], [], [], [], []
+
+		for d in report.orders or []:
+			key = d.name if report.filters.based_on == "Work Order" else d.bom_no
+			raw_materials = report.raw_materials_dict.get(key)
+			if not raw_materials:
+				continue
+
+			order_idx = len(self.order_names)
+			self.order_names.append(d.name)
+			self.order_items.append(d.production_item)
+
+			# finished good (or sub-assembly) stock in the order's warehouse is used up first
+			line_order.append(order_idx)
+			line_item.append(0)
+			line_qty.append(d.qty_to_manufacture or 0)
+			line_bins.append(
+				(bin_index[(d.production_item, d.warehouse)],)
+				if (d.production_item, d.warehouse) in bin_index
+				else ()
+			)
+			line_finished_good.append(True)
+
+			warehouses = report.mrp_warehouses or []
+			for rm in raw_materials:
+				if report.filters.based_on == "Work Order":
+					qty = rm.required_qty
+				else:
+					qty = rm.required_qty_per_unit * d.qty_to_manufacture
+
+				warehouses = report.get_raw_material_warehouses(d, rm, warehouses)
+
+				if rm.item_code not in item_index:
+					item_index[rm.item_code] = len(self.item_codes)
+					self.item_codes.append(rm.item_code)
+					self.raw_material_names[rm.item_code] = rm.raw_material_name
+					self.po_qty[rm.item_code] = rm.get("po_qty") or 0
+
+				line_order.append(order_idx)
+				line_item.append(item_index[rm.item_code])
+				line_qty.append(qty or 0)
+				line_bins.append(
+					tuple(
+						bin_index[(rm.item_code, wh)] for wh in warehouses if (rm.item_code, wh) in bin_index
+					)
+				)
+				line_finished_good.append(False)
+
+		self.line_order = _frozen(line_order, np.int32)
+		self.line_item = _frozen(line_item, np.int32)
+		self.line_qty = _frozen(line_qty, np.float64)
+		self.line_bins = tuple(line_bins)
+		self.line_finished_good = _frozen(line_finished_good, np.bool_)
+		self.bin_warehouses = tuple(bin_warehouses)
+		self.bin_qty = _frozen(bin_qty, np.float64)
+		self.parent_warehouse_map = report.get_parent_warehouses_with_children()
+
+	def evaluate(self, priority=None, exclude_warehouses=None):
+		"""
+		Net every demand line in order priority (listed orders first, the rest in report
+		order) against a copy of the Bin quantities without exclude_warehouses.
+		Returns (shortage per item, covered flag per order).
+		"""
+		available = self.bin_qty.tolist()
+
+		excluded = self.expand_warehouses(exclude_warehouses)
+		if excluded:
+			for i, warehouse in enumerate(self.bin_warehouses):
+				if warehouse in excluded:
+					available[i] = 0
+
+		rank = np.arange(len(self.order_names))
+		if priority:
+			position = {name: i for i, name in enumerate(self.order_names)}
+			listed = [position[name] for name in dict.fromkeys(priority) if name in position]
+			rank[listed] = np.arange(len(listed)) - len(listed)
+
+		sequence = np.argsort(rank[self.line_order], kind="stable")
+		line_shortage = np.zeros(len(self.line_qty))
+
+		for i in sequence.tolist():
+			remaining = self.line_qty[i]
+			for b in self.line_bins[i]:
+				if remaining <= 0:
+					break
+
+				if available[b] > 0:
+					allotted = min(available[b], remaining)
+					available[b] -= allotted
+					remaining -= allotted
+
+			if not self.line_finished_good[i]:
+				line_shortage[i] = max(remaining, 0)
+
+		item_shortage = np.bincount(self.line_item, weights=line_shortage, minlength=len(self.item_codes))
+		short_lines = np.bincount(
+			self.line_order,
+			weights=(line_shortage > SHORTAGE_TOLERANCE).astype(np.float64),
+			minlength=len(self.order_names),
+		)
+
+		return item_shortage, short_lines == 0
+
+	def expand_warehouses(self, warehouses):
+		"""Warehouse names plus, for group warehouses, every warehouse below them."""
+		expanded = set()
+		for warehouse in warehouses or []:
+			expanded.add(warehouse)
+			expanded.update(self.parent_warehouse_map.get(warehouse) or [])
+
+		return expanded
+
+	def get_required_qty(self):
+		return np.bincount(
+			self.line_item,
+			weights=np.where(self.line_finished_good, 0, self.line_qty),
+			minlength=len(self.item_codes),
+		)
+
+
+def _frozen(values, dtype):
+	array = np.array(values, dtype=dtype)
+	array.flags.writeable = False
+	return array
+
+
+@frappe.whitelist()
+def run_scenarios(filters, scenarios):
+	"""
+	Evaluate scenarios side by side on one load of the report inputs.
+
+	scenarios: [{"label": ..., "priority": [order names], "exclude_warehouses": [warehouses]}, ...];
+	the current plan is always evaluated first as the baseline.
+	"""
+	from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+		ProductionPlanReport,
+		check_report_permission,
+	)
+
+	check_report_permission()
+
+	if isinstance(filters, str):
+		filters = json.loads(filters)
+	if isinstance(scenarios, str):
+		scenarios = json.loads(scenarios)
+
+	report = ProductionPlanReport(filters)
+	# scenarios compare against the netted report, not its time-phased view
+	report.filters.time_phased = None
+	report.load_inputs()
+
+	if not (report.orders and report.raw_materials_dict):
+		return {"scenarios": [], "columns": [], "data": [], "orders": []}
+
+	plan = ScenarioPlan(report)
+	current_balance = get_report_balance(report)
+	scenarios = [{"label": _("Current")}, *(scenarios or [])]
+
+	results = [
+		plan.evaluate(scenario.get("priority"), scenario.get("exclude_warehouses")) for scenario in scenarios
+	]
+
+	required_qty = plan.get_required_qty().tolist()
+	shortages = [shortage.tolist() for shortage, _covered in results]
+
+	data = []
+	for i, item_code in enumerate(plan.item_codes):
+		if item_code not in current_balance:
+			continue
+
+		row = {
+			"item_code": item_code,
+			"raw_material_name": plan.raw_material_names.get(item_code),
+			"required_qty": required_qty[i],
+			"po_qty": plan.po_qty.get(item_code),
+		}
+		for s, shortage in enumerate(shortages):
+			row[f"shortage_{s}"] = shortage[i]
+			row[f"balance_{s}"] = current_balance[item_code] + shortage[i] - shortages[0][i]
+		data.append(row)
+
+	orders = [
+		{
+			"order": name,
+			"production_item": plan.order_items[o],
+			**{f"covered_{s}": bool(covered[o]) for s, (_shortage, covered) in enumerate(results)},
+		}
+		for o, name in enumerate(plan.order_names)
+	]
+
+	return {
+		"scenarios": [
+			scenario.get("label") or _("Scenario {0}").format(s) for s, scenario in enumerate(scenarios)
+		],
+		"columns": get_scenario_columns(scenarios),
+		"data": data,
+		"orders": orders,
+	}
+
+
+def get_report_balance(report):
+	"""{item_code: balance_qty} of the report's rows, netting report's loaded inputs (which it consumes)."""
+	report.build_data()
+
+	balance = {}
+	for row in report.data:
+		if row.get("item_code"):
+			# duplicate rows of an item carry 0, its first row the aggregated balance
+			balance[row["item_code"]] = balance.get(row["item_code"], 0) + flt(row.get("balance_qty"))
+
+	return balance
+
+
+def get_scenario_columns(scenarios):
+	columns = [
+		{
+			"label": _("Raw Material Code"),
+			"fieldname": "item_code",
+			"fieldtype": "Link",
+			"options": "Item",
+			"width": 120,
+		},
+		{
+			"label": _("Raw Material Name"),
+			"fieldname": "raw_material_name",
+			"fieldtype": "Data",
+			"width": 130,
+		},
+		{"label": _("Required Qty"), "fieldname": "required_qty", "fieldtype": "Float", "width": 100},
+		{"label": _("PO Qty"), "fieldname": "po_qty", "fieldtype": "Float", "width": 100},
+	]
+
+	for s, scenario in enumerate(scenarios):
+		label = scenario.get("label") or _("Scenario {0}").format(s)
+		columns.extend(
+			[
+				{
+					"label": _("{0}: Shortage").format(label),
+					"fieldname": f"shortage_{s}",
+					"fieldtype": "Float",
+					"width": 120,
+				},
+				{
+					"label": _("{0}: Balance").format(label),
+					"fieldname": f"balance_{s}",
+					"fieldtype": "Float",
+					"width": 120,
+				},
+			]
+		)
+
+	return columns
@@ -0,0 +1,129 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Process-pool execution of the BOM explosion.
+
+The report process prefetches a read-only BOM snapshot and hands it to the
+workers once through the pool initializer; with the fork start method this costs
+no pickling. Work is split into shards round-robin and merged back in input
+order, so the result is identical to the single-process run.
+
+Forking a pool and unpickling the exploded rows in the report process have a
+cost of their own (about 25 ms plus 0.7 µs per row measured, close to exploding
+the row in process), so the pool is only used for explosions of at least
+mrp_shard_min_size rows, counted on the snapshot before exploding. The warehouse
+stock pivot is a plain dict transform, cheaper than pickling its inputs, and
+always runs in process.
+
+Site config:
+	mrp_shard_count: number of worker processes (0/1 disables sharding)
+	mrp_shard_min_size: minimum number of exploded rows before sharding kicks in
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+
+from fiabila_customization.mrp.bom_explosion import explode_bom_rows
+
+DEFAULT_SHARD_MIN_SIZE = 250000
+
+_worker_snapshot = None
+
+
+def get_shard_count(size, units):
+	"""Number of shards for size rows of work split over units, 1 meaning run in process."""
+	shard_count = frappe.utils.cint(frappe.conf.get("mrp_shard_count"))
+	min_size = frappe.utils.cint(frappe.conf.get("mrp_shard_min_size")) or DEFAULT_SHARD_MIN_SIZE
+
+	if shard_count <= 1 or size < min_size:
+		return 1
+
+	return min(shard_count, units)
+
+
+def count_exploded_rows(top_level_rows, snapshot):
+	"""Number of rows explode_bom_rows will return, without exploding."""
+	sizes = {}
+
+	def get_size(bom_no):
+		if bom_no not in sizes:
+			sizes[bom_no] = 0
+			_quantity, children = snapshot.get(bom_no, (1, []))
+			sizes[bom_no] = sum(1 + (get_size(child[3]) if child[3] else 0) for child in children if child[0])
+		return sizes[bom_no]
+
+	return sum(1 + (get_size(d["bom_no"]) if d.get("bom_no") else 0) for d in top_level_rows)
+
+
+def partition(keys, shard_count):
+	return [keys[i::shard_count] for i in range(shard_count)]
+
+
+def run_sharded(func, shards, snapshot):
+	"""Run func(shard) for every shard in a process pool that shares snapshot."""
+	try:
+		mp_context = multiprocessing.get_context("fork")
+	except ValueError:
+		mp_context = None
+
+	with ProcessPoolExecutor(
+		max_workers=len(shards),
+		mp_context=mp_context,
+		initializer=_init_worker,
+		initargs=(snapshot,),
+	) as executor:
+		return list(executor.map(func, shards))
+
+
+def _init_worker(snapshot):
+	global _worker_snapshot
+	_worker_snapshot = snapshot
+
+
+def explode_sharded(top_level_rows, bom_snapshot):
+	"""Parallel explode_bom_rows over the distinct top-level BOMs; same result, same order."""
+	top_level_by_bom = {}
+	for d in top_level_rows:
+		top_level_by_bom.setdefault(d["parent"], []).append(dict(d))
+
+	parents = list(top_level_by_bom)
+	shard_count = get_shard_count(count_exploded_rows(top_level_rows, bom_snapshot), len(parents))
+	if shard_count == 1:
+		return explode_bom_rows(top_level_rows, bom_snapshot)
+
+	shards = [
+		[row for parent in shard_parents for row in top_level_by_bom[parent]]
+		for shard_parents in partition(parents, shard_count)
+	]
+
+	exploded = {}
+	for result in run_sharded(_explode_shard, shards, bom_snapshot):
+		exploded.update(result)
+
+	return {parent: exploded[parent] for parent in parents}
+
+
+def _explode_shard(top_level_rows):
+	return explode_bom_rows(top_level_rows, _worker_snapshot)
+
+
+def pivot_warehouse_stock(item_codes, stock_map, parent_warehouse_map):
+	"""
+	One row per item with the stock summed under every parent warehouse:
+	{"item_code": ..., "stock_<parent>": qty, ...}.
+	"""
+	fieldnames = [
+		(f"stock_{frappe.scrub(parent_wh)}", children) for parent_wh, children in parent_warehouse_map.items()
+	]
+	report_data = []
+
+	for item in item_codes:
+		row = {"item_code": item}
+		for fieldname, child_warehouses in fieldnames:
+			row[fieldname] = sum(stock_map.get((item, child_wh), 0) for child_wh in child_warehouses)
+		report_data.append(row)
+
+	return report_data
@@ -0,0 +1,363 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Host-wide read-only snapshot of the warehouse tree and the flattened BOM requirements.
+
+When the site config enables mrp_shared_snapshot, the report reads both from
+sites/<site>/private/mrp_snapshot.bin, which every worker memory-maps, instead of
+querying and holding its own copy. The file is rebuilt by a background job
+whenever a Warehouse changes or MRP BOM Requirement is refreshed: it is written
+under a temporary name and renamed over the old one, so readers see either the
+old or the new generation, never a partial file. Workers notice a new file by its
+inode and remap it; mappings of the old file stay valid until dropped.
+
+Each generation records when (on the Redis server clock) its warehouse tree was
+read, and on_warehouse_change records when a Warehouse change was committed.
+Until a generation read after the latest change is in place, readers get the
+live tree from the database and ask for a rebuild again, so a lagging snapshot
+never serves a warehouse tree that misses a committed change.
+
+Layout (little-endian):
+	header      HEADER
+	strings     (string_count + 1) uint32 offsets, then the UTF-8 blob
+	warehouses  WAREHOUSE_DTYPE records, ordered by lft
+	boms        BOM_DTYPE records, ordered by name
+	rows        ROW_DTYPE records, grouped by BOM in sequence order
+
+BOM rows carry the BOM tree version they were built from and are used only
+while it still matches (fiabila_customization.mrp.bom_requirements), so a snapshot
+that lags behind a BOM change is never wrong, just bypassed for that BOM.
+"""
+
+import mmap
+import os
+import struct
+
+import frappe
+import numpy as np
+
+MAGIC = b"MRPS"
+VERSION = 2
+SNAPSHOT_FILE = "mrp_snapshot.bin"
+NO_STRING = 0xFFFFFFFF
+WAREHOUSE_CHANGED_KEY = "mrp_snapshot_warehouse_changed"
+
+# magic, version, generation, warehouses_read_at, string_count, warehouse_count, bom_count, row_count
+HEADER = struct.Struct("<4sIQQIIII")
+
+WAREHOUSE_DTYPE = np.dtype([("name", "<u4"), ("lft", "<u4"), ("rgt", "<u4"), ("flags", "u1")])
+BOM_DTYPE = np.dtype([("name", "<u4"), ("modified", "<u4"), ("start", "<u4"), ("count", "<u4")])
+ROW_DTYPE = np.dtype([("item_code", "<u4"), ("raw_material_name", "<u4"), ("bom_no", "<u4"), ("qty", "<f8")])
+
+IS_GROUP, DISABLED, INCLUDE_IN_MRP_REPORT = 1, 2, 4
+
+# {site: SharedSnapshot} of this worker
+_snapshots = {}
+
+
+class SharedSnapshot:
+	def __init__(self, path):
+		with open(path, "rb") as f:
+			self.inode = os.fstat(f.fileno()).st_ino
+			self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		(
+			magic,
+			version,
+			self.generation,
+			self.warehouses_read_at,
+			string_count,
+			warehouse_count,
+			bom_count,
+			row_count,
+		) = HEADER.unpack_from(self.buffer, 0)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(f"{path} is not an MRP snapshot of version {VERSION}")
+
+		offset = HEADER.size
+		self.string_offsets = np.frombuffer(self.buffer, "<u4", string_count + 1, offset)
+		offset += self.string_offsets.nbytes
+		self.strings_start = offset
+		offset += int(self.string_offsets[-1])
+
+		self.warehouses = np.frombuffer(self.buffer, WAREHOUSE_DTYPE, warehouse_count, offset)
+		offset += self.warehouses.nbytes
+		self.boms = np.frombuffer(self.buffer, BOM_DTYPE, bom_count, offset)
+		offset += self.boms.nbytes
+		self.rows = np.frombuffer(self.buffer, ROW_DTYPE, row_count, offset)
+
+	def get_string(self, index):
+		if index == NO_STRING:
+			return None
+
+		start = self.strings_start + int(self.string_offsets[index])
+		end = self.strings_start + int(self.string_offsets[index + 1])
+		return self.buffer[start:end].decode()
+
+	def has_current_warehouse_tree(self):
+		"""False (and a rebuild is requested) when a Warehouse changed after this generation read the tree."""
+		changed_at = frappe.cache().get(frappe.cache().make_key(WAREHOUSE_CHANGED_KEY))
+		if changed_at and int(changed_at) >= self.warehouses_read_at:
+			request_snapshot_rebuild(after_commit=False)
+			return False
+
+		return True
+
+	def get_parent_warehouse_map(self):
+		"""
+		Same map as ProductionPlanReport.get_parent_warehouses_with_children, worked out on
+		the mapped lft / rgt / flags arrays; only the names in the result are decoded.
+		"""
+		lft, rgt, flags = self.warehouses["lft"], self.warehouses["rgt"], self.warehouses["flags"]
+		enabled = (flags & DISABLED) == 0
+		is_group = (flags & IS_GROUP) != 0
+
+		names = {}
+
+		def get_name(position):
+			if position not in names:
+				names[position] = self.get_string(int(self.warehouses["name"][position]))
+			return names[position]
+
+		parent_warehouse_map = {}
+		for position in np.flatnonzero(enabled).tolist():
+			if is_group[position]:
+				# the group itself and every warehouse below it, disabled ones included
+				start = int(np.searchsorted(lft, lft[position], "left"))
+				end = int(np.searchsorted(lft, rgt[position], "right"))
+				below = start + np.flatnonzero(rgt[start:end] <= rgt[position])
+				parent_warehouse_map[get_name(position)] = [get_name(child) for child in below.tolist()]
+			elif flags[position] & INCLUDE_IN_MRP_REPORT:
+				parent_warehouse_map[get_name(position)] = [get_name(position)]
+
+		return parent_warehouse_map
+
+	def find_bom(self, bom_no):
+		"""Position of bom_no in the name-ordered BOM records, or None."""
+		low, high = 0, len(self.boms)
+		while low < high:
+			middle = (low + high) // 2
+			name = self.get_string(int(self.boms[middle]["name"]))
+			if name == bom_no:
+				return middle
+			if name < bom_no:
+				low = middle + 1
+			else:
+				high = middle
+
+		return None
+
+	def get_bom_requirements(self, bom_nos):
+		"""{top_bom: (version, [rows])} like bom_requirements.get_stored_requirements."""
+		requirements = {}
+
+		for bom_no in bom_nos:
+			position = self.find_bom(bom_no)
+			if position is None:
+				continue
+
+			_name, modified_index, start, count = self.boms[position].tolist()
+			requirements[bom_no] = (
+				self.get_string(modified_index),
+				[
+					frappe._dict(
+						parent=bom_no,
+						item_code=self.get_string(item_code),
+						raw_material_name=self.get_string(raw_material_name),
+						required_qty_per_unit=qty,
+						bom_no=self.get_string(sub_bom),
+					)
+					for item_code, raw_material_name, sub_bom, qty in self.rows[
+						start : start + count
+					].tolist()
+				],
+			)
+
+		return requirements
+
+
+def is_enabled():
+	return bool(frappe.conf.get("mrp_shared_snapshot"))
+
+
+def get_snapshot_path():
+	return frappe.get_site_path("private", SNAPSHOT_FILE)
+
+
+def get_shared_snapshot():
+	"""This worker's mapping of the current snapshot, or None when disabled or not built yet."""
+	if not is_enabled():
+		return None
+
+	site = frappe.local.site
+	path = get_snapshot_path()
+
+	try:
+		inode = os.stat(path).st_ino
+	except FileNotFoundError:
+		_snapshots.pop(site, None)
+		request_snapshot_rebuild(after_commit=False)
+		return None
+
+	snapshot = _snapshots.get(site)
+	if not snapshot or snapshot.inode != inode:
+		try:
+			snapshot = _snapshots[site] = SharedSnapshot(path)
+		except ValueError:
+			# written by an older layout
+			_snapshots.pop(site, None)
+			request_snapshot_rebuild(after_commit=False)
+			return None
+		except OSError:
+			frappe.log_error(title="MRP shared snapshot could not be mapped")
+			_snapshots.pop(site, None)
+			return None
+
+	return snapshot
+
+
+def request_snapshot_rebuild(after_commit=True):
+	"""
+	Queue a rebuild; after_commit for callers that change what the snapshot holds,
+	right away for readers, whose transaction may never be committed.
+	"""
+	if not is_enabled():
+		return
+
+	frappe.enqueue(
+		"fiabila_customization.mrp.shared_snapshot.rebuild_snapshot",
+		queue="short",
+		job_id=f"mrp_shared_snapshot::{frappe.local.site}",
+		deduplicate=True,
+		enqueue_after_commit=after_commit,
+	)
+
+
+def on_warehouse_change(doc, method=None):
+	"""doc_events hook for Warehouse changes that can move the tree."""
+	if not is_enabled():
+		return
+
+	frappe.db.after_commit.add(mark_warehouse_change)
+	request_snapshot_rebuild()
+
+
+def mark_warehouse_change():
+	frappe.cache().set(frappe.cache().make_key(WAREHOUSE_CHANGED_KEY), get_redis_clock())
+
+
+def get_redis_clock():
+	"""Microseconds on the Redis server clock, shared by every host of the site."""
+	seconds, microseconds = frappe.cache().time()
+	return seconds * 1_000_000 + microseconds
+
+
+def rebuild_snapshot():
+	"""Write the next generation of the snapshot and swap it in atomically."""
+	from fiabila_customization.mrp.bom_requirements import DOCTYPE
+
+	# before reading: a change committed after this is caught by the readers
+	warehouses_read_at = get_redis_clock()
+	strings = {}
+
+	def intern(value):
+		if value is None:
+			return NO_STRING
+		return strings.setdefault(str(value), len(strings))
+
+	warehouse_tree = frappe.get_all(
+		"Warehouse",
+		fields=["name", "lft", "rgt", "is_group", "disabled", "custom_include_in_mrp_report"],
+		order_by="lft asc",
+	)
+	warehouses = np.array(
+		[
+			(
+				intern(wh.name),
+				wh.lft,
+				wh.rgt,
+				(IS_GROUP if wh.is_group else 0)
+				| (DISABLED if wh.disabled else 0)
+				| (INCLUDE_IN_MRP_REPORT if wh.custom_include_in_mrp_report else 0),
+			)
+			for wh in warehouse_tree
+		],
+		dtype=WAREHOUSE_DTYPE,
+	)
+
+	requirement_rows = frappe.db.sql(
+		f"""
+		SELECT req.top_bom, req.bom_modified, req.item_code, req.raw_material_name,
+			req.required_qty_per_unit, req.bom_no
+		FROM `tab{DOCTYPE}` req
+		INNER JOIN `tabBOM` bom ON bom.name = req.top_bom
+		WHERE bom.docstatus = 1
+		ORDER BY req.top_bom, req.sequence
+		""",
+		as_dict=True,
+	)
+
+	boms, rows = [], []
+	for d in requirement_rows:
+		if not boms or boms[-1][0] != d.top_bom:
+			boms.append([d.top_bom, d.bom_modified, len(rows), 0])
+		boms[-1][3] += 1
+		rows.append(
+			(
+				intern(d.item_code),
+				intern(d.raw_material_name),
+				intern(d.bom_no or None),
+				d.required_qty_per_unit or 0,
+			)
+		)
+
+	# binary search in the reader compares Python strings, so order the same way
+	boms.sort(key=lambda bom: bom[0])
+	boms = np.array(
+		[(intern(name), intern(modified), start, count) for name, modified, start, count in boms],
+		dtype=BOM_DTYPE,
+	)
+	rows = np.array(rows, dtype=ROW_DTYPE)
+
+	encoded = [value.encode() for value in strings]
+	string_offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+	np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+
+	path = get_snapshot_path()
+	generation = get_file_generation(path) + 1
+	temp_path = f"{path}.{os.getpid()}.tmp"
+
+	with open(temp_path, "wb") as f:
+		f.write(
+			HEADER.pack(
+				MAGIC,
+				VERSION,
+				generation,
+				warehouses_read_at,
+				len(encoded),
+				len(warehouses),
+				len(boms),
+				len(rows),
+			)
+		)
+		f.write(string_offsets.tobytes())
+		f.write(b"".join(encoded))
+		f.write(warehouses.tobytes())
+		f.write(boms.tobytes())
+		f.write(rows.tobytes())
+		f.flush()
+		os.fsync(f.fileno())
+
+	os.replace(temp_path, path)
+	return generation
+
+
+def get_file_generation(path):
+	try:
+		with open(path, "rb") as f:
+			magic, _version, generation = struct.unpack("<4sIQ", f.read(16))
+	except (FileNotFoundError, struct.error):
+		return 0
+
+	return generation if magic == MAGIC else 0
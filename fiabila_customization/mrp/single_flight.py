@@ -0,0 +1,259 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Single-flight execution of identical Material Requirement Planning runs.
+
+Runs are keyed by their run token (normalized filters). The first caller takes
+the key's lock and computes; callers arriving while it holds the lock wait for
+its result instead of running the same pipeline again. The Redis lock is kept
+alive by its holder every LOCK_REFRESH_INTERVAL and lapses LOCK_TTL after the
+holder stops (the file lock goes with the holder's process); a waiter that sees
+the lock go away without a result takes over, so a crashed or failing run never
+blocks the others for long. A waiter that has waited WAIT_TIMEOUT computes on its own.
+
+Site config mrp_single_flight_backend selects the lock:
+	redis (default)  shared by every worker of the site
+	file             flock in sites/<site>/locks, for a single host without Redis
+	local            in-process, for development servers and tests
+	off              no coalescing
+"""
+
+import fcntl
+import glob
+import os
+import pickle
+import threading
+import time
+import uuid
+from typing import ClassVar
+
+import frappe
+
+LOCK_TTL = 30
+LOCK_REFRESH_INTERVAL = 10
+WAIT_TIMEOUT = 5 * 60
+RESULT_TTL = 60
+POLL_INTERVAL = 0.2
+
+# compare-and-delete, so a caller never releases a lock that expired and was taken by another
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# compare-and-expire, so a holder only keeps its own lock alive
+REFRESH_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisBackend:
+	def __init__(self):
+		self.cache = frappe.cache()
+		# {key: Event} stopping the heartbeat of each lock held by this backend
+		self.heartbeats = {}
+
+	def get_lock_key(self, key):
+		return self.cache.make_key(f"mrp_flight_lock:{key}")
+
+	def acquire(self, key):
+		token = uuid.uuid4().hex
+		lock_key = self.get_lock_key(key)
+		if self.cache.set(lock_key, token, nx=True, ex=LOCK_TTL):
+			stop = self.heartbeats[key] = threading.Event()
+			threading.Thread(target=self.keep_alive, args=(lock_key, token, stop), daemon=True).start()
+			return token
+
+	def keep_alive(self, lock_key, token, stop):
+		"""Extend the lock while its holder computes; it lapses LOCK_TTL after the holder dies."""
+		while not stop.wait(LOCK_REFRESH_INTERVAL):
+			try:
+				if not self.cache.eval(REFRESH_SCRIPT, 1, lock_key, token, LOCK_TTL):
+					return
+			except Exception:
+				# retried on the next beat, the lock only lapses after LOCK_TTL
+				continue
+
+	def release(self, key, token):
+		stop = self.heartbeats.pop(key, None)
+		if stop:
+			stop.set()
+
+		self.cache.eval(RELEASE_SCRIPT, 1, self.get_lock_key(key), token)
+
+	def holder(self, key):
+		token = self.cache.get(self.get_lock_key(key))
+		return token.decode() if token else None
+
+	def set_result(self, token, result):
+		self.cache.set_value(f"mrp_flight_result:{token}", result, expires_in_sec=RESULT_TTL)
+
+	def get_result(self, token):
+		return self.cache.get_value(f"mrp_flight_result:{token}")
+
+
+class FileBackend:
+	"""flock based; the kernel drops the lock when the holding process dies."""
+
+	def __init__(self, lock_dir=None):
+		self.lock_dir = lock_dir or frappe.get_site_path("locks")
+		os.makedirs(self.lock_dir, exist_ok=True)
+		self.held = {}
+
+	def get_path(self, name):
+		return os.path.join(self.lock_dir, f"mrp_flight_{name}")
+
+	def acquire(self, key):
+		f = open(self.get_path(f"{key}.lock"), "a+")
+		try:
+			fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except BlockingIOError:
+			f.close()
+			return None
+
+		token = uuid.uuid4().hex
+		f.truncate(0)
+		f.write(token)
+		f.flush()
+		self.held[key] = f
+		return token
+
+	def release(self, key, token):
+		f = self.held.pop(key, None)
+		if f:
+			# clear the token first, so nobody waits on a finished flight
+			f.truncate(0)
+			f.flush()
+			fcntl.flock(f, fcntl.LOCK_UN)
+			f.close()
+
+	def holder(self, key):
+		try:
+			f = open(self.get_path(f"{key}.lock"))
+		except FileNotFoundError:
+			return None
+
+		with f:
+			try:
+				fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return f.read() or None
+
+			fcntl.flock(f, fcntl.LOCK_UN)
+			return None
+
+	def set_result(self, token, result):
+		path = self.get_path(f"{token}.result")
+		with open(f"{path}.tmp", "wb") as f:
+			pickle.dump(result, f)
+		os.replace(f"{path}.tmp", path)
+
+		for old_path in glob.glob(self.get_path("*.result")):
+			try:
+				if os.path.getmtime(old_path) < time.time() - RESULT_TTL:
+					os.remove(old_path)
+			except FileNotFoundError:
+				pass
+
+	def get_result(self, token):
+		try:
+			with open(self.get_path(f"{token}.result"), "rb") as f:
+				return pickle.load(f)
+		except FileNotFoundError:
+			return None
+
+
+class LocalBackend:
+	"""In-process stand-in; shared by the threads of one process."""
+
+	# class level: get_backend makes a new backend per run, the threads share these
+	guard: ClassVar[threading.Lock] = threading.Lock()
+	locks: ClassVar[dict] = {}
+	results: ClassVar[dict] = {}
+
+	def acquire(self, key):
+		with self.guard:
+			if key in self.locks:
+				return None
+
+			token = self.locks[key] = uuid.uuid4().hex
+			return token
+
+	def release(self, key, token):
+		with self.guard:
+			if self.locks.get(key) == token:
+				del self.locks[key]
+
+	def holder(self, key):
+		return self.locks.get(key)
+
+	def set_result(self, token, result):
+		now = time.monotonic()
+		with self.guard:
+			for old_token, (_result, stored) in list(self.results.items()):
+				if stored < now - RESULT_TTL:
+					del self.results[old_token]
+
+			self.results[token] = (result, now)
+
+	def get_result(self, token):
+		entry = self.results.get(token)
+		return entry[0] if entry else None
+
+
+BACKENDS = {"redis": RedisBackend, "file": FileBackend, "local": LocalBackend}
+
+
+def get_backend(name=None):
+	name = name or frappe.conf.get("mrp_single_flight_backend") or "redis"
+	if name == "off":
+		return None
+
+	return BACKENDS[name]()
+
+
+def run_single_flight(key, compute, backend=None, wait_timeout=WAIT_TIMEOUT):
+	"""Return compute(), or the result of the identical call already running under key."""
+	if backend is None:
+		return compute()
+
+	deadline = time.monotonic() + wait_timeout
+
+	while True:
+		token = backend.acquire(key)
+		if token:
+			try:
+				result = compute()
+				backend.set_result(token, result)
+				return result
+			finally:
+				backend.release(key, token)
+
+		holder = backend.holder(key)
+		while holder:
+			result = backend.get_result(holder)
+			if result is not None:
+				return result
+
+			if time.monotonic() > deadline:
+				return compute()
+
+			time.sleep(POLL_INTERVAL)
+			if backend.holder(key) != holder:
+				# finished (the result is stored before release) or gone without one
+				result = backend.get_result(holder)
+				if result is not None:
+					return result
+				break
+
+		if time.monotonic() > deadline:
+			return compute()
+
+		# the lock was free again, or its holder failed: try to take over
+		time.sleep(POLL_INTERVAL / 10)
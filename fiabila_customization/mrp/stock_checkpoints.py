@@ -0,0 +1,198 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Stock as of a past date, from periodic checkpoints.
+
+A weekly job stores the stock of every item and warehouse at the end of the
+previous day in MRP Stock Checkpoint (current Bin qty minus what was posted
+since). get_stock_as_of starts from the checkpoint nearest to the requested
+date - the Bin itself counts as today's checkpoint - and replays only the Stock
+Ledger Entries between the two dates, forwards or backwards. Entries inserted
+back-dated or cancelled after a checkpoint was taken are found through the
+ledger's modified index and applied to the checkpoint first, so it never has to
+be rebuilt.
+
+Older dates can be back-filled:
+
+	bench --site <site> execute fiabila_customization.mrp.stock_checkpoints.create_stock_checkpoint --kwargs "{'checkpoint_date': '2025-01-31'}"
+"""
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now, nowdate
+
+DOCTYPE = "MRP Stock Checkpoint"
+
+
+def create_stock_checkpoint(checkpoint_date=None):
+	"""Scheduled weekly: store the stock at the end of checkpoint_date (default yesterday)."""
+	checkpoint_date = getdate(checkpoint_date or add_days(nowdate(), -1))
+	timestamp = now()
+
+	stock = {
+		(d.item_code, d.warehouse): flt(d.actual_qty)
+		for d in frappe.db.sql("SELECT item_code, warehouse, actual_qty FROM `tabBin`", as_dict=True)
+	}
+	# take back what was posted after the checkpoint date
+	for d in frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, SUM(actual_qty) AS qty
+		FROM `tabStock Ledger Entry`
+		WHERE posting_date > %s AND is_cancelled = 0
+		GROUP BY item_code, warehouse
+		""",
+		checkpoint_date,
+		as_dict=True,
+	):
+		key = (d.item_code, d.warehouse)
+		stock[key] = stock.get(key, 0) - flt(d.qty)
+
+	frappe.db.delete(DOCTYPE, {"checkpoint_date": checkpoint_date})
+	frappe.db.bulk_insert(
+		DOCTYPE,
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"checkpoint_date",
+			"item_code",
+			"warehouse",
+			"actual_qty",
+		],
+		[
+			(
+				frappe.generate_hash(length=12),
+				timestamp,
+				timestamp,
+				"Administrator",
+				"Administrator",
+				checkpoint_date,
+				item_code,
+				warehouse,
+				qty,
+			)
+			for (item_code, warehouse), qty in stock.items()
+			if flt(qty, 9)
+		],
+	)
+
+
+def get_stock_as_of(as_of_date, item_codes, warehouses=None):
+	"""{(item_code, warehouse): qty} at the end of as_of_date for item_codes (and warehouses)."""
+	as_of_date = getdate(as_of_date)
+	today = getdate(nowdate())
+	item_codes = list(set(item_codes or []))
+	warehouses = list(set(warehouses)) if warehouses else None
+
+	if not item_codes:
+		return {}
+
+	checkpoint = get_nearest_checkpoint(as_of_date)
+	if as_of_date >= today or not checkpoint or abs(today - as_of_date) <= abs(checkpoint[0] - as_of_date):
+		# the Bin is the nearest checkpoint
+		stock = get_bin_stock(item_codes, warehouses)
+		if as_of_date < today:
+			apply_movements(stock, as_of_date, today, item_codes, warehouses, sign=-1)
+		return stock
+
+	checkpoint_date, created = checkpoint
+	stock = get_checkpoint_stock(checkpoint_date, item_codes, warehouses)
+	apply_changes_since(stock, checkpoint_date, created, item_codes, warehouses)
+
+	if as_of_date > checkpoint_date:
+		apply_movements(stock, checkpoint_date, as_of_date, item_codes, warehouses, sign=1)
+	elif as_of_date < checkpoint_date:
+		apply_movements(stock, as_of_date, checkpoint_date, item_codes, warehouses, sign=-1)
+
+	return stock
+
+
+def get_nearest_checkpoint(as_of_date):
+	"""(checkpoint_date, creation) of the checkpoint closest to as_of_date, or None."""
+	dates = [
+		frappe.db.sql(
+			f"SELECT MAX(checkpoint_date) FROM `tab{DOCTYPE}` WHERE checkpoint_date <= %s", as_of_date
+		)[0][0],
+		frappe.db.sql(
+			f"SELECT MIN(checkpoint_date) FROM `tab{DOCTYPE}` WHERE checkpoint_date > %s", as_of_date
+		)[0][0],
+	]
+	dates = [getdate(d) for d in dates if d]
+	if not dates:
+		return None
+
+	checkpoint_date = min(dates, key=lambda d: abs(d - as_of_date))
+	# a checkpoint is written in one bulk insert, all rows share its creation time
+	created = frappe.db.get_value(DOCTYPE, {"checkpoint_date": checkpoint_date}, "creation")
+
+	return checkpoint_date, created
+
+
+def get_bin_stock(item_codes, warehouses=None):
+	filters = {"item_code": ("in", item_codes)}
+	if warehouses:
+		filters["warehouse"] = ("in", warehouses)
+
+	return {
+		(d.item_code, d.warehouse): flt(d.actual_qty)
+		for d in frappe.get_all("Bin", fields=["item_code", "warehouse", "actual_qty"], filters=filters)
+	}
+
+
+def get_checkpoint_stock(checkpoint_date, item_codes, warehouses=None):
+	filters = {"checkpoint_date": checkpoint_date, "item_code": ("in", item_codes)}
+	if warehouses:
+		filters["warehouse"] = ("in", warehouses)
+
+	return {
+		(d.item_code, d.warehouse): flt(d.actual_qty)
+		for d in frappe.get_all(DOCTYPE, fields=["item_code", "warehouse", "actual_qty"], filters=filters)
+	}
+
+
+def apply_movements(stock, from_date, to_date, item_codes, warehouses=None, sign=1):
+	"""Add (sign=1) or take back (sign=-1) the ledger movements posted after from_date up to to_date."""
+	warehouse_condition = "AND warehouse IN %(warehouses)s" if warehouses else ""
+
+	for d in frappe.db.sql(
+		f"""
+		SELECT item_code, warehouse, SUM(actual_qty) AS qty
+		FROM `tabStock Ledger Entry`
+		WHERE item_code IN %(item_codes)s {warehouse_condition}
+			AND posting_date > %(from_date)s AND posting_date <= %(to_date)s
+			AND is_cancelled = 0
+		GROUP BY item_code, warehouse
+		""",
+		{"item_codes": item_codes, "warehouses": warehouses, "from_date": from_date, "to_date": to_date},
+		as_dict=True,
+	):
+		key = (d.item_code, d.warehouse)
+		stock[key] = stock.get(key, 0) + sign * flt(d.qty)
+
+
+def apply_changes_since(stock, checkpoint_date, created, item_codes, warehouses=None):
+	"""Bring a checkpoint up to date with entries up to its date inserted or cancelled after it was taken."""
+	warehouse_condition = "AND warehouse IN %(warehouses)s" if warehouses else ""
+
+	for d in frappe.db.sql(
+		f"""
+		SELECT item_code, warehouse, actual_qty, is_cancelled, creation
+		FROM `tabStock Ledger Entry`
+		WHERE modified > %(created)s AND posting_date <= %(checkpoint_date)s
+			AND item_code IN %(item_codes)s {warehouse_condition}
+		""",
+		{
+			"created": created,
+			"checkpoint_date": checkpoint_date,
+			"item_codes": item_codes,
+			"warehouses": warehouses,
+		},
+		as_dict=True,
+	):
+		key = (d.item_code, d.warehouse)
+		if not d.is_cancelled and d.creation > created:
+			stock[key] = stock.get(key, 0) + flt(d.actual_qty)
+		elif d.is_cancelled and d.creation <= created:
+			stock[key] = stock.get(key, 0) - flt(d.actual_qty)
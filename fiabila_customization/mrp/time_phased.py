@@ -0,0 +1,113 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Time-phased netting for the Material Requirement Planning report.
+
+Demand and supply lines are bucketed into an item x period matrix and the
+projected on-hand stock is a cumulative sum along the period axis, so the
+cost grows with the number of lines, not with items x buckets.
+"""
+
+import datetime
+
+import numpy as np
+
+PERIOD_DAYS = {"Day": 1, "Week": 7}
+
+
+def get_start_date(start_date, period):
+	"""Align the first bucket: weeks start on Monday, months on the 1st."""
+	if period == "Week":
+		return start_date - datetime.timedelta(days=start_date.weekday())
+	if period == "Month":
+		return start_date.replace(day=1)
+	return start_date
+
+
+def get_period_starts(start_date, period, periods):
+	start = np.datetime64(start_date, "D")
+	if period == "Month":
+		months = start.astype("datetime64[M]") + np.arange(periods)
+		return months.astype("datetime64[D]").astype(datetime.date).tolist()
+
+	days = start + np.arange(periods) * PERIOD_DAYS[period]
+	return days.astype(datetime.date).tolist()
+
+
+def get_period_index(dates, start_date, period, periods):
+	"""
+	Map dates onto bucket numbers 0..periods-1.
+	Missing and overdue dates land in the first bucket, dates past the horizon in the last.
+	"""
+	dates = np.asarray([d or start_date for d in dates], dtype="datetime64[D]")
+	start = np.datetime64(start_date, "D")
+
+	if period == "Month":
+		index = dates.astype("datetime64[M]").astype(np.int64) - start.astype("datetime64[M]").astype(
+			np.int64
+		)
+	else:
+		index = (dates - start).astype(np.int64) // PERIOD_DAYS[period]
+
+	return np.clip(index, 0, periods - 1)
+
+
+def bucket(item_index, period_index, qty, n_items, periods):
+	"""Sum qty into an (n_items, periods) matrix in one pass."""
+	flat = item_index * periods + period_index
+	matrix = np.bincount(flat, weights=qty, minlength=n_items * periods)
+	return matrix.astype(np.float64).reshape(n_items, periods)
+
+
+def build_time_phased_plan(demand, supply, opening, start_date, period="Week", periods=12):
+	"""
+	demand / supply: (item_codes, dates, qtys) sequences, one entry per order or PO line.
+	opening: {item_code: on-hand qty}.
+
+	Returns a dict of numpy arrays keyed by item row:
+	item_codes, opening, demand, supply, projected (on hand at the end of each period),
+	shortage_qty and first_shortage (period index, -1 if never short).
+	"""
+	periods = max(int(periods or 1), 1)
+	start_date = get_start_date(start_date, period)
+
+	demand_items, demand_dates, demand_qty = demand
+	supply_items, supply_dates, supply_qty = supply
+
+	all_items = np.asarray(list(demand_items) + list(supply_items), dtype=object)
+	item_codes, inverse = np.unique(all_items.astype(str), return_inverse=True)
+	n_items = len(item_codes)
+
+	demand_index = inverse[: len(demand_items)]
+	supply_index = inverse[len(demand_items) :]
+
+	demand_matrix = bucket(
+		demand_index,
+		get_period_index(demand_dates, start_date, period, periods),
+		np.asarray(demand_qty, dtype=np.float64),
+		n_items,
+		periods,
+	)
+	supply_matrix = bucket(
+		supply_index,
+		get_period_index(supply_dates, start_date, period, periods),
+		np.asarray(supply_qty, dtype=np.float64),
+		n_items,
+		periods,
+	)
+
+	opening_qty = np.fromiter((opening.get(item, 0.0) or 0.0 for item in item_codes), np.float64, n_items)
+	projected = opening_qty[:, None] + np.cumsum(supply_matrix - demand_matrix, axis=1)
+
+	short = projected < 0
+	return {
+		"item_codes": item_codes,
+		"period_starts": get_period_starts(start_date, period, periods),
+		"opening": opening_qty,
+		"demand": demand_matrix.sum(axis=1),
+		"supply": supply_matrix.sum(axis=1),
+		"projected": projected,
+		"shortage_qty": np.maximum(-projected.min(axis=1), 0.0),
+		"first_shortage": np.where(short.any(axis=1), short.argmax(axis=1), -1),
+	}
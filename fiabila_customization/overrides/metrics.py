@@ -0,0 +1,162 @@
+# fiabila_customization/overrides/metrics.py
+
+"""
+In-process metrics for the doctype override hooks.
+
+Every decorated hook counts its calls and the time spent in it; hooks that
+enforce values also record whether they changed anything. Counters live in
+the worker process and are appended as one JSON line per flush to the day's
+sites/<site>/logs/override_metrics-YYYY-MM-DD.log, at most every FLUSH_INTERVAL
+seconds. get_override_metrics_summary aggregates the files of the days it covers
+for System Managers; a daily job removes files older than METRICS_LOG_RETENTION_DAYS.
+"""
+
+import glob
+import json
+import os
+import time
+from datetime import timedelta
+from functools import wraps
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, now_datetime
+
+FLUSH_INTERVAL = 60
+METRICS_LOG = "override_metrics-{date}.log"
+METRICS_LOG_RETENTION_DAYS = 14
+
+# {site: {hook: [calls, total_seconds, max_seconds, changed]}}
+_metrics = {}
+_last_flush = {}
+
+
+def timed(func):
+	"""Count calls of func and the time spent in it, under its qualified name."""
+	name = func.__qualname__
+
+	@wraps(func)
+	def wrapper(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			record_time(name, time.perf_counter() - start)
+
+	return wrapper
+
+
+def get_site_metrics():
+	return _metrics.setdefault(frappe.local.site, {})
+
+
+def record_time(name, elapsed):
+	metric = get_site_metrics().setdefault(name, [0, 0.0, 0.0, 0])
+	metric[0] += 1
+	metric[1] += elapsed
+	if elapsed > metric[2]:
+		metric[2] = elapsed
+
+	flush_if_due()
+
+
+def record_change(name, changed):
+	"""Note that hook name changed at least one value on this call."""
+	if changed:
+		get_site_metrics().setdefault(name, [0, 0.0, 0.0, 0])[3] += 1
+
+
+def flush_if_due():
+	site = frappe.local.site
+	now = time.monotonic()
+	if now - _last_flush.setdefault(site, now) >= FLUSH_INTERVAL:
+		flush()
+
+
+def flush():
+	"""Append this process's counters for the current site to the metrics log and reset them."""
+	site = frappe.local.site
+	metrics = _metrics.pop(site, None)
+	_last_flush[site] = time.monotonic()
+	if not metrics:
+		return
+
+	timestamp = now_datetime()
+	line = json.dumps({"timestamp": str(timestamp), "pid": os.getpid(), "metrics": metrics})
+	try:
+		with open(get_metrics_log_path(timestamp.date()), "a") as f:
+			f.write(line + "\n")
+	except OSError:
+		# metrics must never break a save
+		pass
+
+
+def get_metrics_log_path(date):
+	return frappe.get_site_path("logs", METRICS_LOG.format(date=date))
+
+
+def prune_metrics_logs():
+	"""Delete daily metrics logs older than METRICS_LOG_RETENTION_DAYS (daily scheduler job)."""
+	oldest = get_metrics_log_path(add_days(getdate(), -METRICS_LOG_RETENTION_DAYS))
+	for path in glob.glob(get_metrics_log_path("*")):
+		# ISO dates in the file names sort like the dates themselves
+		if path < oldest:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+
+@frappe.whitelist()
+def get_override_metrics_summary(since_hours=24):
+	"""
+	Calls, average / max time and change rate per hook over the last since_hours,
+	including this process's unflushed counters; slowest hooks first.
+	"""
+	frappe.only_for("System Manager")
+
+	now = now_datetime()
+	since = frappe.utils.add_to_date(now, hours=-cint(since_hours))
+	totals = {}
+
+	def add(metrics):
+		for name, (calls, total, max_time, changed) in metrics.items():
+			row = totals.setdefault(name, [0, 0.0, 0.0, 0])
+			row[0] += calls
+			row[1] += total
+			row[2] = max(row[2], max_time)
+			row[3] += changed
+
+	# only the daily files that can hold entries since then
+	date = since.date()
+	while date <= now.date():
+		path = get_metrics_log_path(date)
+		date += timedelta(days=1)
+		if not os.path.exists(path):
+			continue
+
+		with open(path) as f:
+			for line in f:
+				try:
+					entry = json.loads(line)
+				except ValueError:
+					continue
+
+				if entry["timestamp"] >= str(since):
+					add(entry["metrics"])
+
+	add(get_site_metrics())
+
+	summary = [
+		{
+			"hook": name,
+			"calls": calls,
+			"total_ms": flt(total * 1000, 3),
+			"avg_ms": flt(total * 1000 / calls, 3) if calls else 0,
+			"max_ms": flt(max_time * 1000, 3),
+			"changed": changed,
+			"change_rate": flt(changed / calls, 3) if calls else 0,
+		}
+		for name, (calls, total, max_time, changed) in totals.items()
+	]
+
+	return sorted(summary, key=lambda d: d["total_ms"], reverse=True)
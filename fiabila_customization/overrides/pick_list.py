@@ -1,11 +1,134 @@
+import inspect
+
 import frappe
+from erpnext.stock.doctype.pick_list import pick_list as erpnext_pick_list
+from erpnext.stock.doctype.pick_list.pick_list import PickList as ERPNextPickList
+from erpnext.stock.doctype.pick_list.pick_list import (
+    filter_locations_by_picked_materials,
+    get_items_with_location_and_quantity,
+    get_locations_based_on_required_qty,
+    validate_picked_materials,
+)
 from erpnext.stock.doctype.pick_list.pick_list import get_available_item_locations as original_get_locations
+from frappe import _
+from frappe.utils import flt
+from frappe.utils.nestedset import get_descendants_of
 
 BLOCKED_WAREHOUSES = [
     "Work in Progress",
     "Quality Checking"
 ]
 
+ORIGINAL_SIGNATURE = inspect.signature(original_get_locations)
+
+# CustomPickList.set_item_locations and get_item_locations follow ERPNext's
+# PickList.set_item_locations and get_available_item_locations of this release line;
+# test_pick_list fails on another one, compare them with ERPNext's before moving it
+ERPNEXT_VERSION = "15"
+
+
+class CustomPickList(ERPNextPickList):
+
+    @frappe.whitelist()
+    def set_item_locations(self, save=False):
+        """
+        ERPNext's set_item_locations (ERPNEXT_VERSION), with the stock of all plain (no serial /
+        batch) items of the pick list read in one query beforehand instead of one query per item,
+        and blocked warehouses left out of the allocation.
+        """
+        self.validate_for_qty()
+        items = self.aggregate_item_qty()
+        picked_items_details = self.get_picked_items_details(items)
+        self.item_location_map = frappe._dict()
+
+        from_warehouses = [self.parent_warehouse] if self.parent_warehouse else []
+        if self.parent_warehouse:
+            from_warehouses.extend(get_descendants_of("Warehouse", self.parent_warehouse))
+
+        item_stock = get_item_stock(
+            [item_doc.item_code for item_doc in items],
+            self.company,
+            from_warehouses,
+            self.get("consider_rejected_warehouses"),
+        )
+
+        # Create replica before resetting, to handle empty table on update after submit.
+        locations_replica = self.get("locations")
+
+        # reset
+        reset_rows = [row for row in self.get("locations") if not row.picked_qty]
+        for row in reset_rows:
+            self.remove(row)
+
+        updated_locations = frappe._dict()
+        len_idx = len(self.get("locations")) or 0
+        for item_doc in items:
+            item_code = item_doc.item_code
+
+            if item_code not in self.item_location_map:
+                self.item_location_map[item_code] = get_item_locations(
+                    item_code,
+                    from_warehouses,
+                    self.item_count_map.get(item_code),
+                    self.company,
+                    picked_item_details=picked_items_details.get(item_code),
+                    consider_rejected_warehouses=self.get("consider_rejected_warehouses"),
+                    item_stock=item_stock,
+                )
+
+            locations = get_items_with_location_and_quantity(item_doc, self.item_location_map, self.docstatus)
+
+            item_doc.idx = None
+            item_doc.name = None
+
+            for row in locations:
+                location = item_doc.as_dict()
+                location.update(row)
+                key = (
+                    location.item_code,
+                    location.warehouse,
+                    location.uom,
+                    location.batch_no,
+                    location.serial_no,
+                    location.sales_order_item or location.material_request_item,
+                )
+
+                if key not in updated_locations:
+                    updated_locations.setdefault(key, location)
+                else:
+                    updated_locations[key].qty += location.qty
+                    updated_locations[key].stock_qty += location.stock_qty
+
+        for location in updated_locations.values():
+            if location.picked_qty > location.stock_qty:
+                location.picked_qty = location.stock_qty
+
+            len_idx += 1
+            location.idx = len_idx
+            self.append("locations", location)
+
+        # If table is empty on update after submit, set stock_qty, picked_qty to 0 so that indicator is red
+        # and give feedback to the user. This is to avoid empty Pick Lists.
+        if not self.get("locations") and self.docstatus == 1:
+            for location in locations_replica:
+                location.stock_qty = 0
+                location.picked_qty = 0
+
+                len_idx += 1
+                location.idx = len_idx
+                self.append("locations", location)
+
+            frappe.msgprint(
+                _(
+                    "Please Restock Items and Update the Pick List to continue. To discontinue, cancel the Pick List."
+                ),
+                title=_("Out of Stock"),
+                indicator="red",
+            )
+
+        if save:
+            self.save()
+
 
 @frappe.whitelist()
 def get_available_item_locations(*args, **kwargs):
@@ -13,28 +136,146 @@ def get_available_item_locations(*args, **kwargs):
     Override ERPNext Pick List warehouse allocation
     Removes blocked warehouses and reallocates stock.
     """
+    arguments = ORIGINAL_SIGNATURE.bind(*args, **kwargs)
+    arguments.apply_defaults()
 
-    # Call original ERPNext function
-    locations = original_get_locations(*args, **kwargs)
+    return get_item_locations(**arguments.arguments)
 
-    if not locations:
-        return locations
 
-    filtered_locations = []
+def get_item_locations(
+    item_code,
+    from_warehouses,
+    required_qty,
+    company,
+    ignore_validation=False,
+    picked_item_details=None,
+    consider_rejected_warehouses=False,
+    item_stock=None,
+):
+    """
+    ERPNext's get_available_item_locations (ERPNEXT_VERSION) without blocked warehouses.
 
-    for row in locations:
-        warehouse_name = row.get("warehouse")
+    Plain items are allocated from item_stock (get_item_stock, read for the whole pick list by
+    CustomPickList), then go through ERPNext's own picked-qty filter, allocation and
+    validation. Serial and batch items use ERPNext's lookup, minus blocked warehouses.
+    """
+    if item_stock is None:
+        item_stock = get_item_stock([item_code], company, from_warehouses, consider_rejected_warehouses)
 
-        # Skip blocked warehouses
-        if warehouse_name in BLOCKED_WAREHOUSES:
-            continue
+    if item_code not in item_stock:
+        # serial and batch items
+        locations = original_get_locations(
+            item_code,
+            from_warehouses,
+            required_qty,
+            company,
+            ignore_validation=ignore_validation,
+            picked_item_details=picked_item_details,
+            consider_rejected_warehouses=consider_rejected_warehouses,
+        )
+        if not locations:
+            return locations
 
-        filtered_locations.append(row)
+        blocked = get_blocked_warehouses(company)
+        filtered_locations = [row for row in locations if row.get("warehouse") not in blocked]
+        if not filtered_locations:
+            throw_blocked_only(item_code)
 
-    if not filtered_locations:
-        frappe.throw(
-            "Stock is only available in blocked warehouses (Work in Progress / Quality Checking). "
-            "Please move stock to valid warehouse."
+        return filtered_locations
+
+    # ERPNext consumes the rows it allocates from, keep the prefetched ones intact
+    locations = [frappe._dict(row) for row in item_stock[item_code]["locations"]]
+
+    if picked_item_details:
+        locations = filter_locations_by_picked_materials(locations, picked_item_details)
+
+    if locations:
+        locations = get_locations_based_on_required_qty(locations, required_qty)
+
+    if not locations and item_stock[item_code]["blocked"]:
+        throw_blocked_only(item_code)
+
+    if not ignore_validation:
+        validate_picked_materials(item_code, required_qty, locations, picked_item_details)
+
+    return locations
+
+
+def get_item_stock(item_codes, company, from_warehouses=None, consider_rejected_warehouses=False):
+    """
+    {item_code: {"locations": [{"warehouse", "qty"}], "blocked": qty}} for the plain items
+    among item_codes: ERPNext's get_available_item_locations_for_other_item for all of them in
+    one query, oldest Bin first, less reserved stock, with blocked warehouses set aside.
+    """
+    item_codes = [item_code for item_code in item_codes if item_code]
+    if not item_codes:
+        return {}
+
+    plain_items = frappe.get_all(
+        "Item",
+        filters={"name": ("in", item_codes), "has_serial_no": 0, "has_batch_no": 0},
+        pluck="name",
+    )
+    if not plain_items:
+        return {}
+
+    bin = frappe.qb.DocType("Bin")
+    warehouse = frappe.qb.DocType("Warehouse")
+
+    # stock reserved by Stock Reservation Entries cannot be picked
+    qty = bin.actual_qty - bin.reserved_stock if frappe.db.has_column("Bin", "reserved_stock") else bin.actual_qty
+    query = (
+        frappe.qb.from_(bin)
+        .select(bin.item_code, bin.warehouse, qty.as_("qty"))
+        .where((bin.item_code.isin(plain_items)) & (qty > 0))
+        .orderby(bin.creation)
+    )
+
+    if from_warehouses:
+        query = query.where(bin.warehouse.isin(list(from_warehouses)))
+    else:
+        query = (
+            query.inner_join(warehouse)
+            .on(warehouse.name == bin.warehouse)
+            .where((warehouse.company == company) & (warehouse.is_group == 0))
+        )
+
+    get_rejected_warehouses = getattr(erpnext_pick_list, "get_rejected_warehouses", None)
+    if not consider_rejected_warehouses and get_rejected_warehouses:
+        rejected_warehouses = get_rejected_warehouses()
+        if rejected_warehouses:
+            query = query.where(bin.warehouse.notin(rejected_warehouses))
+
+    blocked = get_blocked_warehouses(company)
+    stock = {item_code: {"locations": [], "blocked": 0} for item_code in plain_items}
+
+    for d in query.run(as_dict=True):
+        if d.warehouse in blocked:
+            stock[d.item_code]["blocked"] += flt(d.qty)
+        else:
+            stock[d.item_code]["locations"].append({"warehouse": d.warehouse, "qty": flt(d.qty)})
+
+    return stock
+
+
+def get_blocked_warehouses(company=None):
+    """Full names of the warehouses named in BLOCKED_WAREHOUSES, by name or by name without the company abbreviation."""
+    filters = {"company": company} if company else {}
+
+    return set(
+        frappe.get_all(
+            "Warehouse",
+            filters=filters,
+            or_filters={"name": ("in", BLOCKED_WAREHOUSES), "warehouse_name": ("in", BLOCKED_WAREHOUSES)},
+            pluck="name",
         )
+    )
+
 
-    return filtered_locations
\ No newline at end of file
+def throw_blocked_only(item_code):
+    frappe.throw(
+        _(
+            "Stock of {0} is only available in blocked warehouses (Work in Progress / Quality Checking). "
+            "Please move stock to valid warehouse."
+        ).format(item_code)
+    )
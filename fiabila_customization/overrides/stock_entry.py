@@ -1,50 +1,141 @@
 # fiabila_customization/overrides/stock_entry.py
 
 import frappe
+from erpnext.manufacturing.doctype.work_order.work_order import make_stock_entry
 from erpnext.stock.doctype.stock_entry.stock_entry import StockEntry as ERPNextStockEntry
+from frappe import _
+from frappe.utils import cint, flt
+
+from fiabila_customization.overrides.metrics import record_change, timed
+
+BULK_STOCK_ENTRY_PURPOSES = (
+    "Material Transfer for Manufacture",
+    "Material Consumption for Manufacture",
+    "Manufacture",
+)
+BULK_STOCK_ENTRY_CHUNK_SIZE = 50
 
 
 class CustomStockEntry(ERPNextStockEntry):
 
+    @timed
     def validate(self):
         super().validate()
         self.map_warehouses_from_work_order_with_fallback()
 
+    @timed
     def map_warehouses_from_work_order_with_fallback(self):
         if not self.work_order:
             return
 
-        wo = frappe.get_doc("Work Order", self.work_order)
-
-        source_wh = wo.source_warehouse
-        wip_wh = wo.wip_warehouse
-        fg_wh = wo.fg_warehouse
-
-        if self.purpose == "Material Transfer for Manufacture":
-            self.from_warehouse = source_wh
-            self.to_warehouse = wip_wh
-            for item in self.items:
-                item.s_warehouse = source_wh
-                item.t_warehouse = wip_wh
-
-        elif self.purpose == "Material Consumption for Manufacture":
-            self.from_warehouse = wip_wh
-            for item in self.items:
+        # bulk creation hands over the prefetched (source, wip, fg) triple
+        warehouses = self.flags.work_order_warehouses or frappe.db.get_value(
+            "Work Order", self.work_order, ["source_warehouse", "wip_warehouse", "fg_warehouse"]
+        )
+        if not warehouses:
+            frappe.throw(_("Work Order {0} not found").format(self.work_order), frappe.DoesNotExistError)
+
+        before = get_warehouse_values(self)
+        apply_work_order_warehouses(self, *warehouses)
+        record_change(
+            "CustomStockEntry.map_warehouses_from_work_order_with_fallback", get_warehouse_values(self) != before
+        )
+
+
+def get_warehouse_values(doc):
+    return (doc.from_warehouse, doc.to_warehouse, [(d.s_warehouse, d.t_warehouse) for d in doc.items])
+
+
+def apply_work_order_warehouses(doc, source_wh, wip_wh, fg_wh):
+    """Set the header and row warehouses of a Stock Entry from its work order, by purpose."""
+    if doc.purpose == "Material Transfer for Manufacture":
+        doc.from_warehouse = source_wh
+        doc.to_warehouse = wip_wh
+        for item in doc.items:
+            item.s_warehouse = source_wh
+            item.t_warehouse = wip_wh
+
+    elif doc.purpose == "Material Consumption for Manufacture":
+        doc.from_warehouse = wip_wh
+        for item in doc.items:
+            item.s_warehouse = wip_wh
+
+    elif doc.purpose == "Manufacture":
+        doc.from_warehouse = wip_wh
+        doc.to_warehouse = fg_wh
+        for item in doc.items:
+            if item.is_finished_item:
+                item.t_warehouse = fg_wh
+            else:
                 item.s_warehouse = wip_wh
 
-        elif self.purpose == "Manufacture":
-            self.from_warehouse = wip_wh
-            self.to_warehouse = fg_wh
-            for item in self.items:
-                if item.is_finished_item:
-                    item.t_warehouse = fg_wh
-                else:
-                    item.s_warehouse = wip_wh
-
-        elif self.purpose == "Material Receipt":
-            self.to_warehouse = fg_wh
-            for item in self.items:
-                item.t_warehouse = fg_wh
+    elif doc.purpose == "Material Receipt":
+        doc.to_warehouse = fg_wh
+        for item in doc.items:
+            item.t_warehouse = fg_wh
+
+
+@frappe.whitelist()
+def make_stock_entries_for_work_orders(work_orders, purpose="Manufacture", chunk_size=BULK_STOCK_ENTRY_CHUNK_SIZE):
+    """
+    Create and submit one Stock Entry of purpose per work order.
+
+    work_orders: [{"work_order": name, "qty": qty}, ...]; qty defaults to the quantity still
+    to transfer / produce. Each entry is built by ERPNext's work order make_stock_entry, so
+    transferred and consumed quantities and the backflush setting are respected; the work
+    orders' warehouses are read in one query and every chunk of entries is committed together.
+    A failing entry is rolled back on its own and reported with its error.
+    """
+    work_orders = frappe.parse_json(work_orders) or []
+    chunk_size = cint(chunk_size) or BULK_STOCK_ENTRY_CHUNK_SIZE
+
+    if purpose not in BULK_STOCK_ENTRY_PURPOSES:
+        frappe.throw(_("Purpose must be one of {0}").format(", ".join(BULK_STOCK_ENTRY_PURPOSES)))
+
+    work_order_map = get_work_order_details({d.get("work_order") for d in work_orders})
+
+    created, errors = [], []
+    for start in range(0, len(work_orders), chunk_size):
+        for row in work_orders[start : start + chunk_size]:
+            name = row.get("work_order")
+            frappe.db.savepoint("bulk_stock_entry")
+
+            try:
+                wo = work_order_map.get(name)
+                if not wo or wo.docstatus != 1:
+                    frappe.throw(_("Work Order {0} is not submitted").format(name))
+
+                stock_entry = frappe.get_doc(make_stock_entry(name, purpose, flt(row.get("qty")) or None))
+                stock_entry.flags.work_order_warehouses = (wo.source_warehouse, wo.wip_warehouse, wo.fg_warehouse)
+                stock_entry.insert()
+                stock_entry.submit()
+
+                created.append({"work_order": name, "stock_entry": stock_entry.name})
+
+            except Exception as e:
+                frappe.db.rollback(save_point="bulk_stock_entry")
+                frappe.clear_last_message()
+                errors.append({"work_order": name, "error": str(e)})
+
+        frappe.db.commit()
+
+    return {"created": created, "errors": errors}
+
+
+def get_work_order_details(work_orders):
+    """{name: work order with its docstatus and warehouses} for all work_orders in one query."""
+    work_orders = [name for name in work_orders if name]
+    if not work_orders:
+        return {}
+
+    return {
+        d.name: d
+        for d in frappe.get_all(
+            "Work Order",
+            fields=["name", "docstatus", "source_warehouse", "wip_warehouse", "fg_warehouse"],
+            filters={"name": ("in", work_orders)},
+        )
+    }
 
 # import frappe
 # from erpnext.stock.doctype.stock_entry.stock_entry import StockEntry as ERPNextStockEntry
@@ -3,24 +3,31 @@
 import frappe
 from erpnext.manufacturing.doctype.work_order.work_order import WorkOrder as ERPNextWorkOrder
 
+from fiabila_customization.overrides.metrics import record_change, timed
+
+
 class CustomWorkOrder(ERPNextWorkOrder):
 
     # -----------------------------
     # 🔹 CORE OVERRIDE POINTS
     # -----------------------------
 
+    @timed
     def validate(self):
         super().validate()
         self._enforce_custom_warehouses()
 
+    @timed
     def before_save(self):
         # CRITICAL: last point before DB write
         self._enforce_custom_warehouses()
 
+    @timed
     def on_update(self):
         # Ensures values persist after save/update cycles
         self._enforce_custom_warehouses()
 
+    @timed
     def before_submit(self):
         # Final enforcement before submit
         self._enforce_custom_warehouses()
@@ -29,6 +36,7 @@ class CustomWorkOrder(ERPNextWorkOrder):
     # 🔹 MOST IMPORTANT OVERRIDE
     # -----------------------------
 
+    @timed
     def set_required_items(self, reset_only_qty=False):
         # Let ERPNext rebuild items first
         super().set_required_items(reset_only_qty)
@@ -40,6 +48,7 @@ class CustomWorkOrder(ERPNextWorkOrder):
     # 🔹 HARD ENFORCEMENT METHOD
     # -----------------------------
 
+    @timed
     def _enforce_custom_warehouses(self):
         if not self.bom_no:
             return
@@ -50,25 +59,34 @@ class CustomWorkOrder(ERPNextWorkOrder):
         wip_wh = bom.get("custom_workinprogress_warehouse")
         fg_wh = bom.get("custom_target_warehouse")
 
+        changed = False
+
         # 🔴 FORCE override at parent level
         if source_wh:
+            changed |= self.source_warehouse != source_wh
             self.source_warehouse = source_wh
 
         if wip_wh:
+            changed |= self.wip_warehouse != wip_wh
             self.wip_warehouse = wip_wh
 
         if fg_wh:
+            changed |= self.fg_warehouse != fg_wh
             self.fg_warehouse = fg_wh
 
         # 🔴 FORCE override at child level (NO CONDITIONS)
         if source_wh:
             for row in self.required_items:
+                changed |= row.source_warehouse != source_wh
                 row.source_warehouse = source_wh
 
+        record_change("CustomWorkOrder._enforce_custom_warehouses", changed)
+
     # -----------------------------
     # 🔹 OPTIONAL: BLOCK ERPNext DEFAULT LOGIC
     # -----------------------------
 
+    @timed
     def validate_materials(self):
         """
         Override ERPNext internal method that may reset warehouses.
@@ -0,0 +1,8 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+from fiabila_customization.mrp.indexes import add_mrp_indexes
+
+
+def execute():
+	add_mrp_indexes()
@@ -0,0 +1,246 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Synthetic Material Requirement Planning dataset for the MRP tests.
+
+make_dataset bulk-inserts Sales Orders, Work Orders, BOMs, Bins and Purchase Orders
+under PREFIX names, inside the test's transaction; QueryCounter records the SQL sent
+meanwhile.
+"""
+
+import frappe
+
+PREFIX = "_MRPQB"
+COMPANY = f"{PREFIX} Company"
+WAREHOUSE = f"{PREFIX} Stores"
+ITEM_GROUP = f"{PREFIX} Group"
+
+
+class QueryCounter:
+	"""Counts (and keeps, with their values) every SQL statement sent through frappe.db.sql while active."""
+
+	def __init__(self):
+		self.queries = []
+
+	def __enter__(self):
+		db = frappe.local.db
+		original_sql = db.sql
+
+		def counting_sql(query, *args, **kwargs):
+			self.queries.append((str(query), args[0] if args else kwargs.get("values")))
+			return original_sql(query, *args, **kwargs)
+
+		db.sql = counting_sql
+		self._db = db
+		return self
+
+	def __exit__(self, *exc):
+		del self._db.sql
+
+	@property
+	def count(self):
+		return len(self.queries)
+
+
+def get_report_filters(tag, based_on="Sales Order"):
+	"""Report filters selecting the orders of the dataset made with tag."""
+	filters = {
+		"company": COMPANY,
+		"based_on": based_on,
+		"order_by": "Delivery Date" if based_on == "Sales Order" else "Planned Start Date",
+		"item_group": ITEM_GROUP,
+	}
+	if based_on == "Sales Order":
+		filters.update(from_doc=f"{PREFIX}-{tag}-SO-", to_doc=f"{PREFIX}-{tag}-SO-~")
+
+	return filters
+
+
+def make_dataset(size, depth, tag):
+	"""
+	size Sales Order lines, each for its own finished good whose BOM has two raw
+	materials and a chain of depth-1 sub-assembly BOMs below it, plus a submitted
+	Work Order per finished good requiring its top-level raw materials.
+	"""
+	items, boms, bom_items, bins, so_items, po_items = [], [], [], [], [], []
+	work_orders, wo_items = [], []
+
+	def add_item(item_code):
+		items.append((item_code, item_code, item_code, ITEM_GROUP, "Nos"))
+		bins.append((f"{item_code}-bin", item_code, WAREHOUSE, 3))
+		po_items.append(
+			(
+				f"{item_code}-poi",
+				f"{PREFIX}-{tag}-PO",
+				"Purchase Order",
+				"items",
+				item_code,
+				2,
+				0,
+				1,
+				"2030-01-01",
+			)
+		)
+
+	for i in range(size):
+		fg = f"{PREFIX}-{tag}-FG-{i}"
+		add_item(fg)
+
+		for level in range(depth):
+			bom = f"{PREFIX}-{tag}-BOM-{i}-{level}"
+			sub_bom = f"{PREFIX}-{tag}-BOM-{i}-{level + 1}" if level < depth - 1 else None
+			boms.append((bom, fg, 1, 1, 1, 1))
+
+			for j in range(2):
+				rm = f"{PREFIX}-{tag}-RM-{i}-{level}-{j}"
+				add_item(rm)
+				bom_items.append((f"{bom}-{j}", bom, "BOM", "items", j + 1, rm, rm, 2, None, 1))
+				if level == 0:
+					wo_items.append(
+						(
+							f"{PREFIX}-{tag}-WOI-{i}-{j}",
+							f"{PREFIX}-{tag}-WO-{i:05d}",
+							"Work Order",
+							"required_items",
+							j + 1,
+							rm,
+							rm,
+							WAREHOUSE,
+							10,
+							1,
+						)
+					)
+
+			if sub_bom:
+				sa = f"{PREFIX}-{tag}-SA-{i}-{level}"
+				add_item(sa)
+				bom_items.append((f"{bom}-sa", bom, "BOM", "items", 3, sa, sa, 1, sub_bom, 1))
+
+		work_orders.append(
+			(
+				f"{PREFIX}-{tag}-WO-{i:05d}",
+				COMPANY,
+				1,
+				"Not Started",
+				fg,
+				fg,
+				f"{PREFIX}-{tag}-BOM-{i}-0",
+				5,
+				"Nos",
+				"2030-01-01",
+				WAREHOUSE,
+			)
+		)
+		so_items.append(
+			(
+				f"{PREFIX}-{tag}-SOI-{i}",
+				f"{PREFIX}-{tag}-SO-{i:05d}",
+				"Sales Order",
+				"items",
+				fg,
+				fg,
+				f"{PREFIX}-{tag}-BOM-{i}-0",
+				5,
+				0,
+				WAREHOUSE,
+				"2030-01-01",
+				"Nos",
+			)
+		)
+
+	frappe.db.bulk_insert("Item", ["name", "item_code", "item_name", "item_group", "stock_uom"], items)
+	frappe.db.bulk_insert("Bin", ["name", "item_code", "warehouse", "actual_qty"], bins)
+	frappe.db.bulk_insert("BOM", ["name", "item", "quantity", "docstatus", "is_active", "is_default"], boms)
+	frappe.db.bulk_insert(
+		"BOM Item",
+		[
+			"name",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"idx",
+			"item_code",
+			"item_name",
+			"qty",
+			"bom_no",
+			"docstatus",
+		],
+		bom_items,
+	)
+	frappe.db.bulk_insert(
+		"Sales Order",
+		["name", "company", "docstatus", "status", "per_delivered", "base_grand_total"],
+		[(row[1], COMPANY, 1, "To Deliver and Bill", 0, 100) for row in so_items],
+	)
+	frappe.db.bulk_insert(
+		"Sales Order Item",
+		[
+			"name",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"item_code",
+			"item_name",
+			"bom_no",
+			"stock_qty",
+			"produced_qty",
+			"warehouse",
+			"delivery_date",
+			"stock_uom",
+		],
+		so_items,
+	)
+	frappe.db.bulk_insert(
+		"Purchase Order",
+		["name", "company", "docstatus", "status"],
+		[(f"{PREFIX}-{tag}-PO", COMPANY, 1, "To Receive and Bill")],
+	)
+	frappe.db.bulk_insert(
+		"Purchase Order Item",
+		[
+			"name",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"item_code",
+			"qty",
+			"received_qty",
+			"docstatus",
+			"schedule_date",
+		],
+		po_items,
+	)
+	frappe.db.bulk_insert(
+		"Work Order",
+		[
+			"name",
+			"company",
+			"docstatus",
+			"status",
+			"production_item",
+			"item_name",
+			"bom_no",
+			"qty",
+			"stock_uom",
+			"planned_start_date",
+			"fg_warehouse",
+		],
+		work_orders,
+	)
+	frappe.db.bulk_insert(
+		"Work Order Item",
+		[
+			"name",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"idx",
+			"item_code",
+			"item_name",
+			"source_warehouse",
+			"required_qty",
+			"docstatus",
+		],
+		wo_items,
+	)
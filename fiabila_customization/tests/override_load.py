@@ -0,0 +1,354 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Load harness for the Work Order and Stock Entry override save paths.
+
+Loads CustomWorkOrder and CustomStockEntry against stub frappe / ERPNext modules:
+the ERPNext base classes only do what the overrides rely on (default warehouses,
+rebuilding required_items, validate_materials), and the data layer answers from an
+in-memory dataset while counting every call. Then it drives Work Order saves and
+submits (validate, before_save, on_update / validate, before_submit, on_update) and
+Stock Entry validations through the classes and reports throughput, per-hook
+latency percentiles and data-layer calls per document.
+
+The override modules are executed with an import hook that hands them the stubs,
+so sys.modules is never touched and the real frappe of a running process stays in
+place. test_override_load runs it on a small dataset; for measurements:
+
+	python -m fiabila_customization.tests.override_load --work-orders 5000 --stock-entries 5000
+"""
+
+import argparse
+import builtins
+import json
+import os
+import random
+import tempfile
+import time
+import types
+
+OVERRIDES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "overrides")
+
+WORK_ORDER_HOOKS = (
+	"validate",
+	"before_save",
+	"on_update",
+	"before_submit",
+	"set_required_items",
+	"validate_materials",
+	"_enforce_custom_warehouses",
+)
+STOCK_ENTRY_HOOKS = ("validate", "map_warehouses_from_work_order_with_fallback")
+
+STOCK_ENTRY_PURPOSES = (
+	"Material Transfer for Manufacture",
+	"Material Consumption for Manufacture",
+	"Manufacture",
+	"Material Receipt",
+)
+PERCENTILES = (50, 90, 99)
+
+
+class _dict(dict):
+	__getattr__ = dict.get
+
+	def __setattr__(self, key, value):
+		self[key] = value
+
+
+class DataLayer:
+	"""In-memory stand-in for frappe.db and the document cache, counting every call by kind."""
+
+	def __init__(self, dataset):
+		self.dataset = dataset
+		self.calls = {}
+		self.cached_docs = {}
+
+	def count(self, kind):
+		self.calls[kind] = self.calls.get(kind, 0) + 1
+
+	def get_value(self, doctype, name, fieldname=None, *args, **kwargs):
+		self.count("db.get_value")
+		doc = self.dataset[doctype].get(name) or {}
+		if isinstance(fieldname, list | tuple):
+			return tuple(doc.get(f) for f in fieldname)
+		return doc.get(fieldname)
+
+	def get_cached_doc(self, doctype, name):
+		key = (doctype, name)
+		if key not in self.cached_docs:
+			self.count("get_cached_doc (miss)")
+			self.cached_docs[key] = _dict(self.dataset[doctype][name])
+		else:
+			self.count("get_cached_doc (hit)")
+		return self.cached_docs[key]
+
+	def get_doc(self, doctype, name=None):
+		self.count("get_doc")
+		return _dict(self.dataset[doctype][name])
+
+	def __getattr__(self, method):
+		# any other frappe.db method the overrides start using shows up in the report
+		def call(*args, **kwargs):
+			self.count(f"db.{method}")
+
+		return call
+
+
+class StubDocument:
+	def __init__(self, **fields):
+		self.__dict__.update(fields)
+		self.flags = _dict()
+
+	def get(self, key, default=None):
+		return self.__dict__.get(key, default)
+
+
+class StubWorkOrder(StubDocument):
+	"""What ERPNext's Work Order does that the override interacts with."""
+
+	def validate(self):
+		self.wip_warehouse = self.wip_warehouse or "Work In Progress - LT"
+		self.fg_warehouse = self.fg_warehouse or "Finished Goods - LT"
+		self.set_required_items(reset_only_qty=len(self.get("required_items") or []))
+		self.validate_materials()
+
+	def set_required_items(self, reset_only_qty=False):
+		if reset_only_qty:
+			for row in self.required_items:
+				row.required_qty = row.qty_per_unit * self.qty
+			return
+
+		self.required_items = [
+			_dict(
+				item_code=item_code,
+				qty_per_unit=qty,
+				required_qty=qty * self.qty,
+				source_warehouse=self.source_warehouse or "Stores - LT",
+			)
+			for item_code, qty in self.bom_items
+		]
+
+	def validate_materials(self):
+		for row in self.required_items:
+			row.source_warehouse = row.source_warehouse or self.source_warehouse
+
+
+class StubStockEntry(StubDocument):
+	def validate(self):
+		for item in self.items:
+			item.transfer_qty = item.qty
+
+
+def make_stock_entry(work_order_id, purpose, qty=None):
+	return _dict(
+		doctype="Stock Entry", work_order=work_order_id, purpose=purpose, fg_completed_qty=qty, items=[]
+	)
+
+
+def make_stub_modules(data_layer, site_path):
+	frappe = types.ModuleType("frappe")
+	frappe._dict = _dict
+	frappe.local = _dict(site="load-test")
+	frappe.conf = _dict()
+	frappe.db = data_layer
+	frappe.get_cached_doc = data_layer.get_cached_doc
+	frappe.get_doc = data_layer.get_doc
+	frappe.get_site_path = lambda *path: os.path.join(site_path, *path)
+	frappe.whitelist = lambda *args, **kwargs: (lambda func: func)
+	frappe._ = lambda text: text
+
+	utils = types.ModuleType("frappe.utils")
+	utils.cint = lambda value: int(value or 0)
+	utils.flt = (
+		lambda value, precision=None: round(float(value or 0), precision) if precision else float(value or 0)
+	)
+	utils.now_datetime = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
+	frappe.utils = utils
+
+	work_order = types.ModuleType("erpnext.manufacturing.doctype.work_order.work_order")
+	work_order.WorkOrder = StubWorkOrder
+	work_order.make_stock_entry = make_stock_entry
+	stock_entry = types.ModuleType("erpnext.stock.doctype.stock_entry.stock_entry")
+	stock_entry.StockEntry = StubStockEntry
+
+	return {
+		"frappe": frappe,
+		"frappe.utils": utils,
+		"erpnext.manufacturing.doctype.work_order.work_order": work_order,
+		"erpnext.stock.doctype.stock_entry.stock_entry": stock_entry,
+	}
+
+
+def load_override_classes(data_layer, site_path):
+	"""Fresh copies of CustomWorkOrder and CustomStockEntry bound to the stubs."""
+	modules = make_stub_modules(data_layer, site_path)
+
+	def stub_import(name, globals=None, locals=None, fromlist=(), level=0):
+		if name not in modules:
+			return builtins.__import__(name, globals, locals, fromlist, level)
+		# "import frappe" binds the top-level package, "from x.y import z" the module itself
+		return modules[name] if fromlist else modules[name.split(".")[0]]
+
+	override_builtins = {**vars(builtins), "__import__": stub_import}
+	for name in (
+		"fiabila_customization.overrides.metrics",
+		"fiabila_customization.overrides.work_order",
+		"fiabila_customization.overrides.stock_entry",
+	):
+		path = os.path.join(OVERRIDES_DIR, name.rsplit(".", 1)[1] + ".py")
+		module = types.ModuleType(name)
+		module.__file__ = path
+		module.__builtins__ = override_builtins
+		with open(path) as f:
+			exec(compile(f.read(), path, "exec"), vars(module))
+		modules[name] = module
+
+	return (
+		modules["fiabila_customization.overrides.work_order"].CustomWorkOrder,
+		modules["fiabila_customization.overrides.stock_entry"].CustomStockEntry,
+	)
+
+
+def with_hook_timers(cls, hooks, samples):
+	"""Subclass of cls recording the duration of every hook call in samples[hook]."""
+
+	def timer(hook, method):
+		def timed_method(self, *args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return method(self, *args, **kwargs)
+			finally:
+				samples.setdefault(f"{cls.__name__}.{hook}", []).append(time.perf_counter() - start)
+
+		return timed_method
+
+	return type(cls.__name__, (cls,), {hook: timer(hook, getattr(cls, hook)) for hook in hooks})
+
+
+def make_dataset(work_orders, boms=50, seed=42):
+	rng = random.Random(seed)
+	warehouses = [f"WH-{i} - LT" for i in range(20)]
+
+	bom_docs = {}
+	for i in range(boms):
+		kind = rng.random()
+		bom_docs[f"BOM-{i}"] = {
+			"custom_source_warehouse": rng.choice(warehouses) if kind < 0.8 else None,
+			"custom_workinprogress_warehouse": rng.choice(warehouses) if kind < 0.6 else None,
+			"custom_target_warehouse": rng.choice(warehouses) if kind < 0.6 else None,
+			"items": [(f"RM-{i}-{j}", rng.randint(1, 5)) for j in range(rng.randint(2, 12))],
+		}
+
+	work_order_docs = {}
+	for i in range(work_orders):
+		bom_no = f"BOM-{rng.randrange(boms)}"
+		bom = bom_docs[bom_no]
+		# half of the work orders already carry the BOM's warehouses
+		keep = rng.random() < 0.5
+		work_order_docs[f"WO-{i}"] = {
+			"bom_no": bom_no,
+			"qty": rng.randint(1, 100),
+			"source_warehouse": bom["custom_source_warehouse"] if keep else rng.choice(warehouses),
+			"wip_warehouse": bom["custom_workinprogress_warehouse"] if keep else None,
+			"fg_warehouse": bom["custom_target_warehouse"] if keep else None,
+		}
+
+	return {"BOM": bom_docs, "Work Order": work_order_docs, "warehouses": warehouses}
+
+
+def run(work_orders=2000, stock_entries=2000, seed=42):
+	"""Drive the override save paths and return the measurements."""
+	dataset = make_dataset(max(work_orders, 1), seed=seed)
+	data_layer = DataLayer(dataset)
+	rng = random.Random(seed)
+	samples = {}
+
+	with tempfile.TemporaryDirectory() as site_path:
+		os.makedirs(os.path.join(site_path, "logs"))
+		CustomWorkOrder, CustomStockEntry = load_override_classes(data_layer, site_path)
+		WorkOrder = with_hook_timers(CustomWorkOrder, WORK_ORDER_HOOKS, samples)
+		StockEntry = with_hook_timers(CustomStockEntry, STOCK_ENTRY_HOOKS, samples)
+
+		start = time.perf_counter()
+		for name, wo in list(dataset["Work Order"].items())[:work_orders]:
+			doc = WorkOrder(
+				name=name,
+				required_items=[],
+				bom_items=dataset["BOM"][wo["bom_no"]]["items"],
+				**wo,
+			)
+			# insert, then submit
+			doc.validate()
+			doc.before_save()
+			doc.on_update()
+			doc.validate()
+			doc.before_submit()
+			doc.on_update()
+		work_order_time = time.perf_counter() - start
+		work_order_calls = dict(data_layer.calls)
+
+		data_layer.calls.clear()
+		work_order_names = list(dataset["Work Order"])
+		start = time.perf_counter()
+		for _i in range(stock_entries):
+			doc = StockEntry(
+				work_order=rng.choice(work_order_names),
+				purpose=rng.choice(STOCK_ENTRY_PURPOSES),
+				from_warehouse=None,
+				to_warehouse=None,
+				items=[
+					_dict(
+						item_code=f"RM-{j}",
+						qty=1,
+						is_finished_item=j == 0,
+						s_warehouse=None,
+						t_warehouse=None,
+					)
+					for j in range(rng.randint(2, 12))
+				],
+			)
+			doc.validate()
+		stock_entry_time = time.perf_counter() - start
+		stock_entry_calls = dict(data_layer.calls)
+
+	return {
+		"work_orders": summarize_documents(work_orders, work_order_time, work_order_calls),
+		"stock_entries": summarize_documents(stock_entries, stock_entry_time, stock_entry_calls),
+		"hooks": {hook: summarize_latencies(values) for hook, values in sorted(samples.items())},
+	}
+
+
+def summarize_documents(count, elapsed, calls):
+	return {
+		"documents": count,
+		"seconds": round(elapsed, 3),
+		"documents_per_second": round(count / elapsed, 1) if elapsed else None,
+		"data_layer_calls_per_document": {kind: round(n / count, 3) for kind, n in sorted(calls.items())}
+		if count
+		else {},
+	}
+
+
+def summarize_latencies(values):
+	values = sorted(values)
+	summary = {"calls": len(values)}
+	for p in PERCENTILES:
+		summary[f"p{p}_us"] = round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1e6, 2)
+	summary["max_us"] = round(values[-1] * 1e6, 2)
+	return summary
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+	parser.add_argument("--work-orders", type=int, default=2000)
+	parser.add_argument("--stock-entries", type=int, default=2000)
+	parser.add_argument("--seed", type=int, default=42)
+	args = parser.parse_args()
+
+	print(json.dumps(run(args.work_orders, args.stock_entries, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+	main()
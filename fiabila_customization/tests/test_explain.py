@@ -0,0 +1,92 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+EXPLAIN test for the queries issued by the Material Requirement Planning report.
+
+Captures every SELECT sent by ProductionPlanReport.execute_report (Sales Order and
+Work Order modes) and build_material_request_groups on the synthetic MRP dataset,
+runs EXPLAIN on each with the same values and fails if any table is read with a
+full scan (type ALL), whether or not the optimizer had an index to choose from.
+Tables that are read whole by design are listed in FULL_SCAN_ALLOWED.
+"""
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+	ProductionPlanReport,
+	build_material_request_groups,
+)
+from fiabila_customization.tests.mrp_dataset import PREFIX, QueryCounter, get_report_filters, make_dataset
+
+# large enough that the optimizer does not prefer scanning the synthetic tables
+DATASET_SIZE = 200
+
+FULL_SCAN_ALLOWED = {
+	# the warehouse tree is read whole to build the stock columns
+	"tabWarehouse",
+}
+
+
+class TestExplain(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		make_dataset(DATASET_SIZE, depth=2, tag="explain")
+
+	def test_report_queries_use_an_index(self):
+		if frappe.conf.db_type == "postgres":
+			self.skipTest("EXPLAIN output is checked for MariaDB / MySQL only")
+
+		queries = capture_queries()
+		self.assertTrue(queries)
+
+		full_scans = [
+			f"{row.table}: {' '.join(query.split())}"
+			for query, values in queries
+			for row in explain(query, values)
+			if is_full_scan(row)
+		]
+		self.assertFalse(full_scans, "Full table scans:\n" + "\n\n".join(full_scans))
+
+	def test_work_order_mode_reads_the_seeded_work_orders(self):
+		# EXPLAIN on empty Work Order tables would pass without showing anything
+		report = ProductionPlanReport(get_report_filters("explain", "Work Order"))
+		report.execute_report()
+
+		self.assertGreaterEqual(len(report.orders), DATASET_SIZE)
+		self.assertTrue(report.raw_materials_dict)
+
+
+def capture_queries():
+	"""Distinct SELECT statements (with values) issued by the report stages."""
+	with QueryCounter() as counter:
+		for based_on in ("Sales Order", "Work Order"):
+			ProductionPlanReport(get_report_filters("explain", based_on)).execute_report()
+
+		item_codes = frappe.get_all("Item", filters={"name": ("like", f"{PREFIX}-%")}, pluck="name", limit=50)
+		build_material_request_groups([{"item_code": i, "qty": 1} for i in item_codes])
+
+	seen = set()
+	queries = []
+	for query, values in counter.queries:
+		if not query.lstrip().upper().startswith("SELECT") or query in seen:
+			continue
+		seen.add(query)
+		queries.append((query, values))
+
+	return queries
+
+
+def explain(query, values):
+	return frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)
+
+
+def is_full_scan(row):
+	return (
+		row.get("type") == "ALL"
+		and row.get("table")
+		and not row.table.startswith("<")  # derived tables and unions
+		and row.table not in FULL_SCAN_ALLOWED
+	)
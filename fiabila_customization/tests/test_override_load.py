@@ -0,0 +1,43 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+import sys
+
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.tests.override_load import STOCK_ENTRY_HOOKS, WORK_ORDER_HOOKS, run
+
+DOCUMENTS = 200
+BOMS = 50
+
+
+class TestOverrideLoad(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.frappe_module = sys.modules["frappe"]
+		cls.result = run(work_orders=DOCUMENTS, stock_entries=DOCUMENTS)
+
+	def test_stubs_are_not_installed(self):
+		self.assertIs(sys.modules["frappe"], self.frappe_module)
+
+	def test_every_hook_is_exercised(self):
+		for cls_name, hooks in (
+			("CustomWorkOrder", WORK_ORDER_HOOKS),
+			("CustomStockEntry", STOCK_ENTRY_HOOKS),
+		):
+			for hook in hooks:
+				self.assertGreater(
+					self.result["hooks"].get(f"{cls_name}.{hook}", {}).get("calls", 0), 0, hook
+				)
+
+	def test_work_orders_read_each_bom_once(self):
+		calls = self.result["work_orders"]["data_layer_calls_per_document"]
+		self.assertNotIn("get_doc", calls)
+		self.assertLessEqual(calls.get("get_cached_doc (miss)", 0) * DOCUMENTS, BOMS)
+		self.assertEqual(set(calls) - {"get_cached_doc (hit)", "get_cached_doc (miss)"}, set())
+
+	def test_stock_entries_read_the_work_order_once(self):
+		calls = self.result["stock_entries"]["data_layer_calls_per_document"]
+		self.assertLessEqual(calls.get("db.get_value", 0), 1)
+		self.assertNotIn("get_doc", calls)
@@ -0,0 +1,17 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+import erpnext
+from erpnext.stock.doctype.pick_list import pick_list as erpnext_pick_list
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.overrides.pick_list import ERPNEXT_VERSION, get_available_item_locations
+
+
+class TestPickList(FrappeTestCase):
+	def test_allocation_copy_matches_erpnext_version(self):
+		# CustomPickList.set_item_locations is a copy of ERPNext's; review it on upgrade
+		self.assertEqual(erpnext.__version__.split(".")[0], ERPNEXT_VERSION)
+
+	def test_erpnext_lookup_is_not_replaced(self):
+		self.assertIsNot(erpnext_pick_list.get_available_item_locations, get_available_item_locations)
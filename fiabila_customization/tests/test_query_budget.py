@@ -0,0 +1,82 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+"""
+Query-budget tests for the Material Requirement Planning report.
+
+Counts every frappe.db.sql call made by ProductionPlanReport.execute_report and by
+the Material Request proposal (build_material_request_groups) on synthetic datasets
+of increasing size, and fails when the count grows with the number of rows. Across
+BOM depths the count may grow by at most QUERIES_PER_BOM_LEVEL per extra level.
+"""
+
+from itertools import pairwise
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+	ProductionPlanReport,
+	build_material_request_groups,
+)
+from fiabila_customization.tests.mrp_dataset import PREFIX, QueryCounter, get_report_filters, make_dataset
+
+DATASET_SIZES = (5, 25, 100)
+BOM_DEPTHS = (1, 2, 3, 4)
+QUERIES_PER_BOM_LEVEL = 2
+
+
+class TestQueryBudget(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+
+		# warm up meta and document caches so they don't count against the first dataset
+		make_dataset(min(DATASET_SIZES), depth=1, tag="warmup")
+		count_report_queries("warmup")
+		count_material_request_queries("warmup")
+
+		for size in DATASET_SIZES:
+			make_dataset(size, depth=2, tag=f"s{size}")
+
+		for depth in BOM_DEPTHS:
+			make_dataset(min(DATASET_SIZES), depth=depth, tag=f"d{depth}")
+
+	def test_report_queries_do_not_grow_with_data_size(self):
+		counts = {size: count_report_queries(f"s{size}") for size in DATASET_SIZES}
+		self.assertEqual(len(set(counts.values())), 1, f"execute_report query count by size: {counts}")
+
+	def test_report_queries_grow_per_bom_level_only(self):
+		counts = {depth: count_report_queries(f"d{depth}") for depth in BOM_DEPTHS}
+
+		for shallow, deep in pairwise(BOM_DEPTHS):
+			self.assertLessEqual(
+				counts[deep] - counts[shallow],
+				QUERIES_PER_BOM_LEVEL * (deep - shallow),
+				f"execute_report query count by BOM depth: {counts}",
+			)
+
+	def test_material_request_proposal_queries_do_not_grow_with_data_size(self):
+		counts = {size: count_material_request_queries(f"s{size}") for size in DATASET_SIZES}
+		self.assertEqual(
+			len(set(counts.values())), 1, f"build_material_request_groups query count by size: {counts}"
+		)
+
+
+def count_report_queries(tag):
+	with QueryCounter() as counter:
+		ProductionPlanReport(get_report_filters(tag)).execute_report()
+
+	return counter.count
+
+
+def count_material_request_queries(tag):
+	items = frappe.get_all("Item", filters={"name": ("like", f"{PREFIX}-{tag}-%")}, pluck="name")
+	proposal = [{"item_code": item_code, "qty": 1.5} for item_code in items]
+
+	# Material Requests are inserted per document by a background job, out of budget;
+	# count the proposal work only
+	with QueryCounter() as counter:
+		build_material_request_groups(proposal)
+
+	return counter.count
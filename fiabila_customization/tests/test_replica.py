@@ -0,0 +1,94 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+	ProductionPlanReport,
+)
+from fiabila_customization.mrp import replica
+from fiabila_customization.mrp.replica import (
+	LAG_CACHE_KEY,
+	discard_replica_connection,
+	open_replica,
+	run_on_replica,
+)
+
+
+class FakeReplica:
+	def __init__(self):
+		self.closed = False
+		self.rollbacks = 0
+
+	def sql(self, query, *args, **kwargs):
+		if self.closed:
+			raise ConnectionError("connection closed")
+		return ((1,),)
+
+	def rollback(self):
+		self.rollbacks += 1
+
+	def close(self):
+		self.closed = True
+
+
+class TestReplica(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(LAG_CACHE_KEY)
+		self.addCleanup(frappe.cache().delete_value, LAG_CACHE_KEY)
+		self.addCleanup(discard_replica_connection)
+
+	def test_lag_check_and_connection_are_reused(self):
+		with (
+			patch.dict(frappe.conf, {"mrp_replica": {"db_name": frappe.conf.db_name}}),
+			patch.object(replica, "connect_replica", side_effect=lambda settings: FakeReplica()) as connect,
+			patch.object(replica, "get_replica_lag", return_value=0) as get_lag,
+		):
+			first = open_replica()
+			self.assertEqual(run_on_replica(lambda: "read"), "read")
+			second = open_replica()
+
+		self.assertIs(first, second)
+		self.assertEqual(connect.call_count, 1)
+		self.assertEqual(get_lag.call_count, 1)
+		# every use ends its read transaction
+		self.assertGreaterEqual(first.rollbacks, 1)
+
+	def test_dropped_connection_is_replaced(self):
+		with (
+			patch.dict(frappe.conf, {"mrp_replica": {"db_name": frappe.conf.db_name}}),
+			patch.object(replica, "connect_replica", side_effect=lambda settings: FakeReplica()) as connect,
+			patch.object(replica, "get_replica_lag", return_value=0),
+		):
+			first = open_replica()
+			first.close()
+			second = open_replica()
+
+		self.assertIsNot(first, second)
+		self.assertEqual(connect.call_count, 2)
+
+	def test_lagging_replica_is_skipped(self):
+		with (
+			patch.dict(frappe.conf, {"mrp_replica": {"db_name": frappe.conf.db_name, "max_lag": 30}}),
+			patch.object(replica, "connect_replica", side_effect=lambda settings: FakeReplica()),
+			patch.object(replica, "get_replica_lag", return_value=120),
+		):
+			self.assertIsNone(open_replica())
+
+	def test_replica_run_matches_primary(self):
+		"""Point site config mrp_replica at a copy of the site database to run this on one host."""
+		if not frappe.conf.get("mrp_replica"):
+			self.skipTest("mrp_replica is not configured")
+
+		company = frappe.db.get_value("Company", {}, "name")
+		if not company:
+			self.skipTest("no Company to plan for")
+
+		filters = {"company": company, "based_on": "Sales Order", "order_by": "Delivery Date"}
+		_columns, primary_data = ProductionPlanReport(filters).execute_report()
+		_columns, replica_data = run_on_replica(lambda: ProductionPlanReport(filters).execute_report())
+
+		self.assertEqual(primary_data, replica_data)
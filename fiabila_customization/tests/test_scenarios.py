@@ -0,0 +1,41 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.fiabila_customization.report.material_requirement_planning.material_requirement_planning import (
+	ProductionPlanReport,
+)
+from fiabila_customization.mrp.scenarios import run_scenarios
+from fiabila_customization.tests.mrp_dataset import get_report_filters, make_dataset
+
+
+class TestScenarios(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		make_dataset(10, depth=2, tag="scenarios")
+		cls.filters = get_report_filters("scenarios")
+
+	def test_current_scenario_matches_report_balance(self):
+		_columns, data = ProductionPlanReport(self.filters).execute_report()
+		report_balance = {}
+		for row in data:
+			if row.get("item_code"):
+				report_balance[row["item_code"]] = (
+					report_balance.get(row["item_code"], 0) + row["balance_qty"]
+				)
+
+		result = run_scenarios(self.filters, [])
+
+		self.assertTrue(result["data"])
+		self.assertEqual({row["item_code"] for row in result["data"]}, set(report_balance))
+		for row in result["data"]:
+			self.assertAlmostEqual(row["balance_0"], report_balance[row["item_code"]], places=6)
+
+	def test_unchanged_scenario_keeps_current_balance(self):
+		result = run_scenarios(self.filters, [{"label": "Same"}])
+
+		for row in result["data"]:
+			self.assertAlmostEqual(row["balance_1"], row["balance_0"], places=6)
+			self.assertAlmostEqual(row["shortage_1"], row["shortage_0"], places=6)
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, dhanvant marathe and contributors
+# For license information, please see license.txt
+
+import tempfile
+import threading
+import time
+import uuid
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from fiabila_customization.mrp import single_flight
+from fiabila_customization.mrp.single_flight import FileBackend, LocalBackend, RedisBackend, run_single_flight
+
+
+class TestSingleFlight(FrappeTestCase):
+	def test_local_backend_coalesces_identical_runs(self):
+		self.assert_coalesced(LocalBackend())
+
+	def test_file_backend_coalesces_identical_runs(self):
+		with tempfile.TemporaryDirectory() as lock_dir:
+			self.assert_coalesced(FileBackend(lock_dir))
+
+	def test_failed_run_does_not_block_the_next_one(self):
+		backend = LocalBackend()
+		key = f"test-{uuid.uuid4().hex}"
+
+		def fail():
+			raise ValueError("failed run")
+
+		with self.assertRaises(ValueError):
+			run_single_flight(key, fail, backend)
+
+		self.assertEqual(run_single_flight(key, lambda: "computed", backend), "computed")
+
+	def test_waiters_take_over_when_the_redis_holder_dies(self):
+		key = f"test-{uuid.uuid4().hex}"
+		holder = RedisBackend()
+
+		with patch.object(single_flight, "LOCK_TTL", 1):
+			holder.acquire(key)
+			# the holder's process is gone: no more heartbeats and no release
+			holder.heartbeats.pop(key).set()
+
+			start = time.monotonic()
+			self.assertEqual(run_single_flight(key, lambda: "computed", RedisBackend()), "computed")
+
+		self.assertLess(time.monotonic() - start, 5)
+
+	def assert_coalesced(self, backend, callers=4, duration=0.5):
+		"""Start callers identical runs at once; a single computation must serve them all."""
+		key = f"test-{uuid.uuid4().hex}"
+		computations = []
+		results = [None] * callers
+
+		def compute():
+			computations.append(1)
+			time.sleep(duration)
+			return {"computed_at": time.time()}
+
+		def caller(i):
+			results[i] = run_single_flight(key, compute, backend)
+
+		threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(len(computations), 1)
+		self.assertTrue(all(result == results[0] for result in results), results)